@@ -0,0 +1,98 @@
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+from dotenv import load_dotenv
+from app.metrics import Counter, Gauge, Histogram
+
+load_dotenv()
+
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "10"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "2000"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "2"))
+ADMISSION_RETRY_MIN_SECONDS = float(os.getenv("ADMISSION_RETRY_MIN_SECONDS", "1"))
+ADMISSION_RETRY_MAX_SECONDS = float(os.getenv("ADMISSION_RETRY_MAX_SECONDS", "60"))
+
+admission_wait = Histogram(
+    "chat_admission_wait_seconds", "Time a connecting client waited for an authentication slot.",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0)
+)
+admission_admitted = Counter("chat_admission_admitted_total", "Connections that entered the authentication stage.")
+admission_rejected = Counter(
+    "chat_admission_rejected_total", "Connections turned away by admission control.", ("reason",)
+)
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent=ADMISSION_MAX_CONCURRENT,
+        max_queue=ADMISSION_MAX_QUEUE,
+        max_wait=ADMISSION_MAX_WAIT_SECONDS,
+        retry_min=ADMISSION_RETRY_MIN_SECONDS,
+        retry_max=ADMISSION_RETRY_MAX_SECONDS,
+        seed: Optional[int] = None
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_min = retry_min
+        self.retry_max = retry_max
+        self.rng = random.Random(seed)
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.waiting = 0
+        self.active = 0
+        self.service_time = 0.01
+        self.rejected = {
+            "queue_full": admission_rejected.labels("queue_full"),
+            "timeout": admission_rejected.labels("timeout"),
+        }
+
+    def retry_after(self):
+        backlog = (self.waiting + self.active) * self.service_time / self.max_concurrent
+        ceiling = min(self.retry_max, self.retry_min + 2 * backlog)
+        return round(self.rng.uniform(self.retry_min, max(self.retry_min, ceiling)), 2)
+
+    def reject(self, reason: str):
+        self.rejected[reason].inc()
+        return AdmissionRejected(reason, self.retry_after())
+
+    async def wait_for_slot(self):
+        if self.waiting >= self.max_queue:
+            raise self.reject("queue_full")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            raise self.reject("timeout")
+        finally:
+            self.waiting -= 1
+
+    @asynccontextmanager
+    async def admit(self):
+        queued_at = time.perf_counter()
+        if self.semaphore.locked():
+            await self.wait_for_slot()
+        else:
+            await self.semaphore.acquire()
+        started = time.perf_counter()
+        admission_wait.observe(started - queued_at)
+        admission_admitted.inc()
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.semaphore.release()
+            self.service_time = 0.9 * self.service_time + 0.1 * (time.perf_counter() - started)
+
+admission = AdmissionController()
+Gauge("chat_admission_queue_depth", "Connecting clients waiting for an authentication slot.", function=lambda: admission.waiting)
+Gauge("chat_admission_active", "Connections currently being authenticated.", function=lambda: admission.active)
@@ -0,0 +1,291 @@
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional
+from bson import ObjectId
+from dotenv import load_dotenv
+from app.database import get_mongo_db
+from app.queries import conversation_filter
+from app.sharding import message_shards, MESSAGE_ORDER
+
+load_dotenv()
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "data/archive")
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "0"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+ARCHIVE_BLOCK_MESSAGES = int(os.getenv("ARCHIVE_BLOCK_MESSAGES", "256"))
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+INDEX_RECORD = struct.Struct("<QIIqq")
+DATETIME_FIELDS = ("timestamp", "read_at")
+
+class IndexEntry(NamedTuple):
+    offset: int
+    length: int
+    count: int
+    first_ts: int
+    last_ts: int
+
+def to_micros(value: datetime):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+def from_micros(value: int):
+    return EPOCH + timedelta(microseconds=value)
+
+def encode_message(msg):
+    record = {}
+    for key, value in msg.items():
+        if key == '_id':
+            record['id'] = str(value)
+        elif key in DATETIME_FIELDS and value is not None:
+            record[key] = to_micros(value)
+        else:
+            record[key] = value
+    return record
+
+def decode_message(record):
+    msg = {'_id': ObjectId(record.pop('id'))}
+    for key, value in record.items():
+        if key in DATETIME_FIELDS and value is not None:
+            msg[key] = from_micros(value)
+        else:
+            msg[key] = value
+    return msg
+
+class ColdStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.indexes: Dict[tuple, List[IndexEntry]] = {}
+        self.lock = threading.Lock()
+
+    def _key(self, user_id: int, other_user_id: int):
+        return (min(user_id, other_user_id), max(user_id, other_user_id))
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, f"{key[0]}_{key[1]}.{suffix}")
+
+    def _index(self, key):
+        entries = self.indexes.get(key)
+        if entries is None:
+            entries = []
+            try:
+                with open(self._path(key, "idx"), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                data = b""
+            usable = len(data) - len(data) % INDEX_RECORD.size
+            for offset in range(0, usable, INDEX_RECORD.size):
+                entries.append(IndexEntry(*INDEX_RECORD.unpack_from(data, offset)))
+            self.indexes[key] = entries
+        return entries
+
+    def count(self, user_id: int, other_user_id: int):
+        return sum(entry.count for entry in self._index(self._key(user_id, other_user_id)))
+
+    def last_timestamp(self, user_id: int, other_user_id: int) -> Optional[datetime]:
+        entries = self._index(self._key(user_id, other_user_id))
+        return from_micros(entries[-1].last_ts) if entries else None
+
+    def append(self, user_id: int, other_user_id: int, messages):
+        if not messages:
+            return
+        key = self._key(user_id, other_user_id)
+        payload = zlib.compress(
+            json.dumps([encode_message(msg) for msg in messages], separators=(",", ":"), default=str).encode()
+        )
+        with self.lock:
+            entries = self._index(key)
+            offset = entries[-1].offset + entries[-1].length if entries else 0
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(key, "seg"), "ab") as seg:
+                seg.truncate(offset)
+                seg.write(payload)
+                seg.flush()
+                os.fsync(seg.fileno())
+            entry = IndexEntry(
+                offset, len(payload), len(messages),
+                to_micros(messages[0]['timestamp']), to_micros(messages[-1]['timestamp'])
+            )
+            with open(self._path(key, "idx"), "ab") as idx:
+                idx.truncate(len(entries) * INDEX_RECORD.size)
+                idx.write(INDEX_RECORD.pack(*entry))
+                idx.flush()
+                os.fsync(idx.fileno())
+            self.indexes[key] = entries + [entry]
+
+    def read(self, user_id: int, other_user_id: int, skip: int = 0, limit: Optional[int] = None):
+        key = self._key(user_id, other_user_id)
+        entries = self._index(key)
+        if not entries:
+            return []
+        messages = []
+        position = 0
+        with open(self._path(key, "seg"), "rb") as seg, \
+                mmap.mmap(seg.fileno(), 0, access=mmap.ACCESS_READ) as segment:
+            for entry in entries:
+                if position + entry.count <= skip:
+                    position += entry.count
+                    continue
+                block = json.loads(zlib.decompress(segment[entry.offset:entry.offset + entry.length]))
+                start = max(0, skip - position)
+                position += entry.count
+                for record in block[start:]:
+                    messages.append(decode_message(record))
+                    if limit is not None and len(messages) >= limit:
+                        return messages
+        return messages
+
+    def iter_blocks(self, user_id: int, other_user_id: int, after_ts: Optional[int] = None):
+        key = self._key(user_id, other_user_id)
+        entries = self._index(key)
+        if not entries:
+            return
+        with open(self._path(key, "seg"), "rb") as seg, \
+                mmap.mmap(seg.fileno(), 0, access=mmap.ACCESS_READ) as segment:
+            for entry in entries:
+                if after_ts is not None and entry.last_ts < after_ts:
+                    continue
+                block = json.loads(zlib.decompress(segment[entry.offset:entry.offset + entry.length]))
+                yield [decode_message(record) for record in block]
+
+cold_store = ColdStore(ARCHIVE_DIR)
+
+def hot_filter(user_id: int, other_user_id: int, archived_until: Optional[datetime]):
+    query = conversation_filter(user_id, other_user_id)
+    if archived_until is None:
+        return query
+    return {'$and': [query, {'timestamp': {'$gt': archived_until}}]}
+
+def read_conversation(mongo_db, user_id: int, other_user_id: int, skip: int = 0, limit: Optional[int] = None):
+    limit = limit or None
+    cold_count = cold_store.count(user_id, other_user_id)
+    messages = []
+    if skip < cold_count:
+        messages = cold_store.read(user_id, other_user_id, skip, limit)
+    if limit is not None and len(messages) >= limit:
+        return messages
+
+    archived_until = cold_store.last_timestamp(user_id, other_user_id)
+    messages.extend(message_shards.find(
+        mongo_db, user_id, other_user_id,
+        hot_filter(user_id, other_user_id, archived_until),
+        skip=max(0, skip - cold_count),
+        limit=None if limit is None else limit - len(messages)
+    ))
+    return messages
+
+def iter_conversation(mongo_db, user_id: int, other_user_id: int, after=None, batch_size=ARCHIVE_BLOCK_MESSAGES):
+    after_key = None
+    after_ts = None
+    if after is not None:
+        after_key = (after[0], after[1])
+        after_ts = to_micros(after[0])
+    for block in cold_store.iter_blocks(user_id, other_user_id, after_ts):
+        for msg in block:
+            if after_key is None or (msg['timestamp'], msg['_id']) > after_key:
+                yield msg
+
+    query = hot_filter(user_id, other_user_id, cold_store.last_timestamp(user_id, other_user_id))
+    if after_key is not None:
+        query = {'$and': [query, {'$or': [
+            {'timestamp': {'$gt': after_key[0]}},
+            {'timestamp': after_key[0], '_id': {'$gt': after_key[1]}}
+        ]}]}
+    cursor = message_shards.find(mongo_db, user_id, other_user_id, query, batch_size=batch_size)
+    try:
+        yield from cursor
+    finally:
+        cursor.close()
+
+def oldest_unread_timestamp(collections, user_id: int, other_user_id: int) -> Optional[datetime]:
+    oldest = None
+    for collection in collections:
+        msg = collection.find_one(
+            {'$and': [conversation_filter(user_id, other_user_id), {'read': False}]},
+            projection={'timestamp': 1}, sort=MESSAGE_ORDER
+        )
+        if msg and (oldest is None or msg['timestamp'] < oldest):
+            oldest = msg['timestamp']
+    return oldest
+
+def archive_conversation(mongo_db, user_id: int, other_user_id: int, cutoff: datetime, block_size=ARCHIVE_BLOCK_MESSAGES):
+    collections = message_shards.collections_for(mongo_db, user_id, other_user_id)
+    # Segments are immutable, so stop before the first message that can still be marked read
+    oldest_unread = oldest_unread_timestamp(collections, user_id, other_user_id)
+    if oldest_unread is not None:
+        cutoff = min(cutoff, oldest_unread)
+    archived_until = cold_store.last_timestamp(user_id, other_user_id)
+    window = {'$lt': cutoff}
+    if archived_until is not None:
+        for collection in collections:
+            collection.delete_many({'$and': [
+                conversation_filter(user_id, other_user_id),
+                {'timestamp': {'$lte': archived_until}}
+            ]})
+        window['$gt'] = archived_until
+
+    archived = 0
+    batch = []
+
+    def flush():
+        cold_store.append(user_id, other_user_id, batch)
+        for collection in collections:
+            collection.delete_many({'_id': {'$in': [msg['_id'] for msg in batch]}})
+
+    cursor = message_shards.find(mongo_db, user_id, other_user_id, {'$and': [
+        conversation_filter(user_id, other_user_id),
+        {'timestamp': window}
+    ]}, batch_size=block_size)
+    for msg in cursor:
+        if len(batch) >= block_size and msg['timestamp'] != batch[-1]['timestamp']:
+            flush()
+            archived += len(batch)
+            batch = []
+        batch.append(msg)
+    if batch:
+        flush()
+        archived += len(batch)
+    return archived
+
+def archive_once(mongo_db, older_than: timedelta):
+    cutoff = datetime.utcnow() - older_than
+    conversations = set()
+    for collection in message_shards.all_collections(mongo_db):
+        for conversation in collection.aggregate([
+            {'$match': {'timestamp': {'$lt': cutoff}, 'read': True}},
+            {'$group': {'_id': {
+                'a': {'$min': ['$sender_id', '$receiver_id']},
+                'b': {'$max': ['$sender_id', '$receiver_id']}
+            }}}
+        ]):
+            conversations.add((conversation['_id']['a'], conversation['_id']['b']))
+    archived = 0
+    for user_id, other_user_id in sorted(conversations):
+        archived += archive_conversation(mongo_db, user_id, other_user_id, cutoff)
+    return archived
+
+async def archive_loop():
+    older_than = timedelta(days=ARCHIVE_AFTER_DAYS)
+    while True:
+        try:
+            await asyncio.to_thread(archive_once, get_mongo_db(), older_than)
+        except Exception:
+            logger.exception("Message archiving failed")
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+
+archiver_started = False
+
+async def start_archiver():
+    global archiver_started
+    if archiver_started or ARCHIVE_AFTER_DAYS <= 0:
+        return
+    archiver_started = True
+    asyncio.create_task(archive_loop())
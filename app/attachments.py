@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from dotenv import load_dotenv
+from starlette.responses import Response
+from app.metrics import Counter
+
+load_dotenv()
+
+ATTACHMENT_DIR = os.getenv("ATTACHMENT_DIR", "data/attachments")
+ATTACHMENT_CHUNK_BYTES = int(os.getenv("ATTACHMENT_CHUNK_BYTES", str(4 * 1024 * 1024)))
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(100 * 1024 * 1024)))
+ATTACHMENT_WRITE_BYTES = int(os.getenv("ATTACHMENT_WRITE_BYTES", str(1024 * 1024)))
+ATTACHMENT_READ_BYTES = int(os.getenv("ATTACHMENT_READ_BYTES", str(256 * 1024)))
+
+ZEROCOPY = "http.response.zerocopy"
+
+attachment_uploaded_bytes = Counter("chat_attachment_uploaded_bytes_total", "Attachment bytes written to storage.")
+attachment_served_bytes = Counter("chat_attachment_served_bytes_total", "Attachment bytes sent to clients.")
+
+class AttachmentTooLarge(Exception):
+    pass
+
+class EmptyAttachment(Exception):
+    pass
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+class ChunkWriter:
+    def __init__(self, directory: str, chunk_size: int):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.index = 0
+        self.written = 0
+        self.fd: Optional[int] = None
+
+    def _close_chunk(self):
+        if self.fd is not None:
+            os.fsync(self.fd)
+            os.close(self.fd)
+            self.fd = None
+
+    def write(self, data: bytes):
+        view = memoryview(data)
+        while view:
+            room = self.chunk_size - self.written % self.chunk_size
+            if self.fd is None:
+                self.fd = os.open(chunk_path(self.directory, self.index), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            piece = view[:room]
+            os.write(self.fd, piece)
+            self.written += len(piece)
+            view = view[len(piece):]
+            if self.written % self.chunk_size == 0:
+                self._close_chunk()
+                self.index += 1
+
+    def close(self):
+        self._close_chunk()
+
+def chunk_path(directory: str, index: int):
+    return os.path.join(directory, f"{index:06d}.chunk")
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start = max(0, size - int(last))
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+def attachment_summary(meta):
+    return {
+        'id': meta['id'],
+        'filename': meta['filename'],
+        'content_type': meta['content_type'],
+        'size': meta['size']
+    }
+
+class AttachmentStore:
+    def __init__(self, directory: str, chunk_size: int = ATTACHMENT_CHUNK_BYTES, max_size: int = ATTACHMENT_MAX_BYTES):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.max_size = max_size
+        self.lock = threading.Lock()
+
+    def _path(self, attachment_id: str):
+        return os.path.join(self.directory, attachment_id[-2:], attachment_id)
+
+    def _write_meta(self, path: str, meta):
+        temp_path = os.path.join(path, "meta.json.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, os.path.join(path, "meta.json"))
+
+    async def save(self, stream, owner_id: int, filename: str, content_type: str):
+        attachment_id = str(ObjectId())
+        final_path = self._path(attachment_id)
+        partial_path = final_path + ".partial"
+        await asyncio.to_thread(os.makedirs, partial_path)
+        writer = ChunkWriter(partial_path, self.chunk_size)
+        buffer = bytearray()
+        size = 0
+        try:
+            async for data in stream:
+                size += len(data)
+                if size > self.max_size:
+                    raise AttachmentTooLarge()
+                buffer += data
+                if len(buffer) >= ATTACHMENT_WRITE_BYTES:
+                    await asyncio.to_thread(writer.write, bytes(buffer))
+                    buffer.clear()
+            if size == 0:
+                raise EmptyAttachment()
+            if buffer:
+                await asyncio.to_thread(writer.write, bytes(buffer))
+            await asyncio.to_thread(writer.close)
+            meta = {
+                'id': attachment_id,
+                'owner_id': owner_id,
+                'recipients': [],
+                'filename': filename,
+                'content_type': content_type,
+                'size': size,
+                'chunk_size': self.chunk_size,
+                'created_at': datetime.utcnow().isoformat()
+            }
+            await asyncio.to_thread(self._write_meta, partial_path, meta)
+            await asyncio.to_thread(os.rename, partial_path, final_path)
+        except BaseException:
+            writer.close()
+            await asyncio.to_thread(shutil.rmtree, partial_path, True)
+            raise
+        attachment_uploaded_bytes.inc(size)
+        return meta
+
+    def load(self, attachment_id: str):
+        if not ObjectId.is_valid(attachment_id):
+            return None
+        try:
+            with open(os.path.join(self._path(attachment_id), "meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def grant(self, attachment_id: str, user_id: int):
+        with self.lock:
+            meta = self.load(attachment_id)
+            if meta is not None and user_id not in meta['recipients']:
+                meta['recipients'].append(user_id)
+                self._write_meta(self._path(attachment_id), meta)
+            return meta
+
+    def can_read(self, meta, user_id: int):
+        return user_id == meta['owner_id'] or user_id in meta['recipients']
+
+    def spans(self, meta, start: int, end: int) -> List[Tuple[str, int, int]]:
+        path = self._path(meta['id'])
+        chunk_size = meta['chunk_size']
+        result = []
+        for index in range(start // chunk_size, end // chunk_size + 1):
+            chunk_start = index * chunk_size
+            offset = max(start, chunk_start) - chunk_start
+            count = min(end + 1, chunk_start + chunk_size) - chunk_start - offset
+            result.append((chunk_path(path, index), offset, count))
+        return result
+
+class ChunkedFileResponse(Response):
+    def __init__(self, spans, status_code: int = 200, headers=None, media_type: Optional[str] = None):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.spans = spans
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] != "HEAD":
+            zerocopy = ZEROCOPY in scope.get("extensions", {})
+            for path, offset, count in self.spans:
+                if zerocopy:
+                    await self._send_zerocopy(send, path, offset, count)
+                else:
+                    await self._send_pread(send, path, offset, count)
+                attachment_served_bytes.inc(count)
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_zerocopy(self, send, path, offset, count):
+        f = await asyncio.to_thread(open, path, "rb")
+        try:
+            await send({"type": ZEROCOPY, "file": f, "offset": offset, "count": count, "more_body": True})
+        finally:
+            f.close()
+
+    async def _send_pread(self, send, path, offset, count):
+        fd = await asyncio.to_thread(os.open, path, os.O_RDONLY)
+        try:
+            while count > 0:
+                data = await asyncio.to_thread(os.pread, fd, min(ATTACHMENT_READ_BYTES, count), offset)
+                if not data:
+                    raise OSError(f"Attachment chunk {path} is shorter than expected")
+                await send({"type": "http.response.body", "body": data, "more_body": True})
+                offset += len(data)
+                count -= len(data)
+        finally:
+            os.close(fd)
+
+attachment_store = AttachmentStore(ATTACHMENT_DIR)
@@ -1,7 +1,7 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from app.metrics import instrument_engine, MongoCommandMetrics
 import os
 from dotenv import load_dotenv
 
@@ -19,6 +19,7 @@ MONGODB_DB = os.getenv("MONGODB_DB", "chat_messages")
 DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -29,7 +30,11 @@ mongo_db = None
 def get_mongo_client():
     global mongo_client
     if mongo_client is None:
-        mongo_client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
+        mongo_client = MongoClient(
+            MONGODB_URI,
+            serverSelectionTimeoutMS=5000,
+            event_listeners=[MongoCommandMetrics()]
+        )
     return mongo_client
 
 def get_mongo_db():
@@ -46,11 +51,3 @@ def get_db():
     finally:
         db.close()
 
-async def init_db():
-    Base.metadata.create_all(bind=engine)
-    try:
-        client = get_mongo_client()
-        client.admin.command('ping')
-    except ConnectionFailure:
-        pass
-
@@ -0,0 +1,62 @@
+import json
+import os
+import zlib
+from typing import Optional
+from bson import ObjectId
+from dotenv import load_dotenv
+from app.archive import to_micros, from_micros
+
+load_dotenv()
+
+EXPORT_BATCH_MESSAGES = int(os.getenv("EXPORT_BATCH_MESSAGES", "500"))
+GZIP_WBITS = 31
+
+class InvalidExportCursor(ValueError):
+    pass
+
+def export_cursor(msg):
+    return f"{to_micros(msg['timestamp'])}-{msg['_id']}"
+
+def parse_export_cursor(cursor: Optional[str]):
+    if not cursor:
+        return None
+    micros, _, message_id = cursor.partition("-")
+    if not micros.isdigit() or not ObjectId.is_valid(message_id):
+        raise InvalidExportCursor(cursor)
+    return from_micros(int(micros)), ObjectId(message_id)
+
+def export_record(msg):
+    record = {
+        'id': str(msg['_id']),
+        'sender_id': msg['sender_id'],
+        'receiver_id': msg['receiver_id'],
+        'content': msg['content'],
+        'timestamp': msg['timestamp'].isoformat(),
+        'read': msg.get('read', False),
+        'read_at': msg['read_at'].isoformat() if msg.get('read_at') else None
+    }
+    if msg.get('attachment'):
+        record['attachment'] = msg['attachment']
+    record['cursor'] = export_cursor(msg)
+    return record
+
+def ndjson_chunks(messages, compress: bool = False, batch_size: int = EXPORT_BATCH_MESSAGES):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, GZIP_WBITS) if compress else None
+    lines = []
+
+    def flush():
+        data = "".join(lines).encode()
+        lines.clear()
+        return compressor.compress(data) if compressor else data
+
+    for msg in messages:
+        lines.append(json.dumps(export_record(msg), separators=(",", ":"), default=str) + "\n")
+        if len(lines) >= batch_size:
+            chunk = flush()
+            if chunk:
+                yield chunk
+    chunk = flush()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
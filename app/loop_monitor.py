@@ -0,0 +1,124 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Optional
+from dotenv import load_dotenv
+from app.metrics import Histogram, Counter
+
+load_dotenv()
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.05"))
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", "0.1"))
+LOOP_STALL_HISTORY = int(os.getenv("LOOP_STALL_HISTORY", "50"))
+LOOP_MONITOR_DEBUG_ENDPOINT = os.getenv("LOOP_MONITOR_DEBUG_ENDPOINT", "false").lower() == "true"
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+MONITOR_FILES = {os.path.join(APP_DIR, "loop_monitor.py"), os.path.join(APP_DIR, "metrics.py")}
+ENTRY_FILES = {os.path.join(APP_DIR, "main.py")}
+
+loop_lag = Histogram(
+    "chat_event_loop_lag_seconds", "Delay between a scheduled event-loop wake-up and when it ran.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+loop_stalls = Counter(
+    "chat_event_loop_stalls_total", "Event-loop stalls longer than the threshold, by blocking handler.", ("handler",)
+)
+
+def _is_app_frame(frame_summary):
+    filename = os.path.abspath(frame_summary.filename)
+    return filename.startswith(APP_DIR) and filename not in MONITOR_FILES
+
+def describe_stack(frame):
+    stack = traceback.extract_stack(frame)
+    handler = None
+    site = None
+    call = None
+    for index, frame_summary in enumerate(stack):
+        if not _is_app_frame(frame_summary):
+            continue
+        if handler is None and os.path.abspath(frame_summary.filename) not in ENTRY_FILES:
+            handler = frame_summary.name
+        site = f"{os.path.relpath(frame_summary.filename, os.path.dirname(APP_DIR))}:{frame_summary.lineno}"
+        call = None
+        if index + 1 < len(stack):
+            callee = stack[index + 1]
+            call = f"{os.path.basename(os.path.dirname(callee.filename))}/{os.path.basename(callee.filename)}:{callee.name}"
+    return {
+        "handler": handler or "unknown",
+        "site": site,
+        "call": call,
+        "stack": [f"{f.filename}:{f.lineno} in {f.name}" for f in stack],
+    }
+
+class LoopMonitor:
+    def __init__(self, interval=LOOP_MONITOR_INTERVAL, threshold=LOOP_STALL_THRESHOLD, history=LOOP_STALL_HISTORY):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = deque(maxlen=history)
+        self.last_tick = time.monotonic()
+        self.loop_thread_id: Optional[int] = None
+        self.open_stall: Optional[dict] = None
+        self.stopped = threading.Event()
+        self.heartbeat_task = None
+        self.watchdog_thread = None
+
+    def start(self):
+        self.loop_thread_id = threading.get_ident()
+        self.last_tick = time.monotonic()
+        self.stopped.clear()
+        self.heartbeat_task = asyncio.create_task(self.heartbeat())
+        self.watchdog_thread = threading.Thread(target=self.watchdog, name="loop-watchdog", daemon=True)
+        self.watchdog_thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+
+    async def heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            loop_lag.observe(lag)
+            stall = self.open_stall
+            if stall is not None:
+                stall["duration_s"] = round(lag, 4)
+                self.open_stall = None
+            self.last_tick = now
+
+    def watchdog(self):
+        poll = max(self.threshold / 4, 0.005)
+        while not self.stopped.wait(poll):
+            blocked_for = time.monotonic() - self.last_tick - self.interval
+            if blocked_for < self.threshold or self.open_stall is not None:
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            stall = describe_stack(frame)
+            stall["detected_at"] = datetime.utcnow().isoformat()
+            stall["duration_s"] = None
+            self.open_stall = stall
+            self.stalls.append(stall)
+            loop_stalls.labels(stall["handler"]).inc()
+
+    def snapshot(self):
+        return {
+            "interval_s": self.interval,
+            "threshold_s": self.threshold,
+            "stalls": list(reversed(self.stalls)),
+        }
+
+loop_monitor = LoopMonitor()
+
+async def start_loop_monitor():
+    if LOOP_MONITOR_ENABLED and loop_monitor.heartbeat_task is None:
+        loop_monitor.start()
@@ -1,16 +1,33 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
-from app.database import init_db
+from app.readiness import readiness, start_warm_up, stop_warm_up, mark_started
 from app.routers import auth, users, messages
 from app.socket_handlers import sio_app, start_background_tasks
+from app.metrics import MetricsMiddleware, render_latest, CONTENT_TYPE
+from app.loop_monitor import loop_monitor, start_loop_monitor, LOOP_MONITOR_DEBUG_ENDPOINT
+from app.archive import start_archiver
+from app.spool import start_spool, stop_spool
+from app.static_assets import static_assets
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await init_db()
+    await start_loop_monitor()
+    await start_warm_up()
+    await asyncio.to_thread(static_assets.load)
+    await start_spool()
     await start_background_tasks()
+    await start_archiver()
+    logger.info("Accepting requests %.3fs after process start", mark_started())
     yield
+    await stop_warm_up()
+    await stop_spool()
+    loop_monitor.stop()
 
 fastapi_app = FastAPI(
     title="Real-Time Chat Application",
@@ -18,7 +35,7 @@ fastapi_app = FastAPI(
     lifespan=lifespan
 )
 
-fastapi_app.mount("/static", StaticFiles(directory="static"), name="static")
+fastapi_app.mount("/static", static_assets, name="static")
 
 fastapi_app.add_middleware(
     CORSMiddleware,
@@ -27,19 +44,36 @@ fastapi_app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+fastapi_app.add_middleware(MetricsMiddleware)
 
 fastapi_app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
 fastapi_app.include_router(users.router, prefix="/api/users", tags=["users"])
 fastapi_app.include_router(messages.router, prefix="/api/messages", tags=["messages"])
 
 @fastapi_app.get("/")
-async def root():
-    from fastapi.responses import FileResponse
-    import os
-    if os.path.exists("static/index.html"):
-        return FileResponse("static/index.html")
+async def root(request: Request):
+    asset = static_assets.get("index.html")
+    if asset is not None:
+        return static_assets.response(asset, request.headers, "no-cache")
     return {"message": "Real-Time Chat Application API", "ui": "/static/index.html"}
 
+@fastapi_app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=render_latest(), media_type=CONTENT_TYPE)
+
+@fastapi_app.get("/healthz", include_in_schema=False)
+async def healthz():
+    return {"status": "ok"}
+
+@fastapi_app.get("/readyz", include_in_schema=False)
+async def readyz():
+    return JSONResponse(readiness.snapshot(), status_code=200 if readiness.ready else 503)
+
+if LOOP_MONITOR_DEBUG_ENDPOINT:
+    @fastapi_app.get("/debug/loop-stalls", include_in_schema=False)
+    async def loop_stalls():
+        return loop_monitor.snapshot()
+
 class SocketIOMiddleware:
     def __init__(self, app, socketio_app):
         self.app = app
@@ -0,0 +1,246 @@
+import functools
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Optional, Sequence, Tuple
+from pymongo import monitoring
+from socketio.exceptions import ConnectionRefusedError as SocketConnectionRefused
+from sqlalchemy import event
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_float(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[Tuple, object] = {}
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self.children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self.labels()
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_float(child.value)}"
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        if not self.labelnames:
+            self.labels()
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def _render_child(self, values, child):
+        value = self.function() if self.function else child.value
+        yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_float(value)}"
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        if not self.labelnames:
+            self.labels()
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _render_child(self, values, child):
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), list(child.counts)):
+            cumulative += bucket_count
+            le = 'le="' + _format_float(bound) + '"'
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+        labels = _format_labels(self.labelnames, values)
+        yield f"{self.name}_sum{labels} {_format_float(child.sum)}"
+        yield f"{self.name}_count{labels} {child.count}"
+
+def render_latest():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+http_request_duration = Histogram(
+    "chat_http_request_duration_seconds", "REST request latency by route.", ("method", "route")
+)
+http_request_errors = Counter(
+    "chat_http_request_errors_total", "REST requests that failed with a 5xx or an exception.", ("method", "route")
+)
+socket_event_duration = Histogram(
+    "chat_socket_event_duration_seconds", "Socket.IO event handler latency.", ("event",)
+)
+socket_event_errors = Counter(
+    "chat_socket_event_errors_total", "Socket.IO event handlers that raised.", ("event",)
+)
+mongo_command_duration = Histogram(
+    "chat_mongo_command_duration_seconds", "MongoDB command latency by command name.", ("command",)
+)
+mongo_command_errors = Counter(
+    "chat_mongo_command_errors_total", "MongoDB commands that failed.", ("command",)
+)
+postgres_query_duration = Histogram(
+    "chat_postgres_query_duration_seconds", "PostgreSQL statement latency."
+)
+postgres_query_errors = Counter(
+    "chat_postgres_query_errors_total", "PostgreSQL statements that failed."
+)
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            http_request_duration.labels(method, path).observe(time.perf_counter() - started)
+            if status_code >= 500:
+                http_request_errors.labels(method, path).inc()
+
+def timed_event(handler):
+    name = handler.__name__
+    duration = socket_event_duration.labels(name)
+    errors = socket_event_errors.labels(name)
+
+    @functools.wraps(handler)
+    async def wrapper(*args):
+        started = time.perf_counter()
+        try:
+            return await handler(*args)
+        except SocketConnectionRefused:
+            # Refused connects are expected; admission control counts them separately
+            raise
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            duration.observe(time.perf_counter() - started)
+
+    return wrapper
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, command_event):
+        pass
+
+    def succeeded(self, command_event):
+        mongo_command_duration.labels(command_event.command_name).observe(command_event.duration_micros / 1e6)
+
+    def failed(self, command_event):
+        mongo_command_duration.labels(command_event.command_name).observe(command_event.duration_micros / 1e6)
+        mongo_command_errors.labels(command_event.command_name).inc()
+
+def instrument_engine(engine):
+    duration = postgres_query_duration.labels()
+    errors = postgres_query_errors.labels()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration.observe(time.perf_counter() - context._query_started)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        errors.inc()
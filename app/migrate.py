@@ -0,0 +1,139 @@
+import argparse
+import logging
+import sys
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+from pymongo import ASCENDING
+from sqlalchemy import (
+    Boolean, Column, DateTime, Index, Integer, MetaData, String, Table, func, inspect, select, text
+)
+from app import database
+from app.sharding import (
+    message_shards, ensure_message_indexes, drop_index_if_exists, CONVERSATION_INDEX, LEGACY_CONVERSATION_INDEX
+)
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK_ID = 0x636861746d6967
+
+schema_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", schema_metadata,
+    Column("version", String, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False)
+)
+
+class Migration(NamedTuple):
+    version: str
+    description: str
+    apply: Callable
+
+def users_table(metadata):
+    return Table(
+        "users", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("mobile_number", String, unique=True, index=True, nullable=False),
+        Column("username", String, nullable=True),
+        Column("created_at", DateTime(timezone=True), server_default=func.now()),
+        Column("is_active", Boolean),
+        Column("identity_stability", String)
+    )
+
+def initial_schema(connection, mongo_db):
+    metadata = MetaData()
+    users_table(metadata)
+    metadata.create_all(connection, checkfirst=True)
+
+def user_prefix_indexes(connection, mongo_db):
+    users = users_table(MetaData())
+    username_lower = func.lower(users.c.username).label("username_lower")
+    indexes = [
+        Index("ix_users_username_prefix", username_lower, postgresql_ops={"username_lower": "text_pattern_ops"}),
+        Index("ix_users_mobile_number_prefix", users.c.mobile_number, postgresql_ops={"mobile_number": "text_pattern_ops"}),
+    ]
+    for index in indexes:
+        index.create(connection, checkfirst=True)
+
+def message_indexes(connection, mongo_db):
+    messages = mongo_db.messages
+    messages.create_index([('sender_id', ASCENDING), ('receiver_id', ASCENDING), ('timestamp', ASCENDING)])
+    messages.create_index([('receiver_id', ASCENDING), ('read', ASCENDING), ('sender_id', ASCENDING)])
+
+def shard_message_indexes(connection, mongo_db):
+    for collection in message_shards.all_collections(mongo_db):
+        ensure_message_indexes(collection)
+
+def conversation_order_indexes(connection, mongo_db):
+    for collection in message_shards.all_collections(mongo_db):
+        collection.create_index(CONVERSATION_INDEX)
+        drop_index_if_exists(collection, LEGACY_CONVERSATION_INDEX)
+
+MIGRATIONS: List[Migration] = [
+    Migration("0001", "Create users table", initial_schema),
+    Migration("0002", "Prefix search indexes on users", user_prefix_indexes),
+    Migration("0003", "Message lookup indexes in MongoDB", message_indexes),
+    Migration("0004", "Message lookup indexes on every message shard", shard_message_indexes),
+    Migration("0005", "Conversation index covering the (timestamp, _id) history order", conversation_order_indexes),
+]
+
+def applied_versions(connection):
+    if not inspect(connection).has_table(schema_migrations.name):
+        return set()
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+def pending_migrations(connection):
+    applied = applied_versions(connection)
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+def migrate(engine=None, mongo_db=None):
+    engine = engine or database.engine
+    applied = []
+    with engine.connect() as connection:
+        locked = connection.dialect.name == "postgresql"
+        if locked:
+            connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            connection.commit()
+        try:
+            schema_metadata.create_all(connection, checkfirst=True)
+            pending = pending_migrations(connection)
+            connection.commit()
+            for migration in pending:
+                if mongo_db is None:
+                    mongo_db = database.get_mongo_db()
+                logger.info("Applying migration %s: %s", migration.version, migration.description)
+                with connection.begin():
+                    migration.apply(connection, mongo_db)
+                    connection.execute(schema_migrations.insert().values(
+                        version=migration.version,
+                        description=migration.description,
+                        applied_at=datetime.utcnow()
+                    ))
+                applied.append(migration.version)
+        finally:
+            if locked:
+                connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+                connection.commit()
+    return applied
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply database migrations.")
+    parser.add_argument("--status", action="store_true", help="list pending migrations without applying them")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.status:
+        with database.engine.connect() as connection:
+            pending = pending_migrations(connection)
+        for migration in pending:
+            print(f"pending  {migration.version}  {migration.description}")
+        if not pending:
+            print("Database schema is up to date")
+        return 0
+
+    applied = migrate()
+    print(f"Applied {len(applied)} migration(s)" if applied else "Database schema is up to date")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
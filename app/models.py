@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index
 from sqlalchemy.sql import func
 from app.database import Base
 import random
@@ -14,6 +14,19 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     identity_stability = Column(String, default="stable")
 
+    __table_args__ = (
+        Index(
+            "ix_users_username_prefix",
+            func.lower(username).label("username_lower"),
+            postgresql_ops={"username_lower": "text_pattern_ops"}
+        ),
+        Index(
+            "ix_users_mobile_number_prefix",
+            mobile_number,
+            postgresql_ops={"mobile_number": "text_pattern_ops"}
+        ),
+    )
+
     def apply_identity_drift(self):
         drift_factor = random.random()
         if drift_factor < 0.05:
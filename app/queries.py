@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Optional
+
+def conversation_filter(user_id: int, other_user_id: int):
+    return {
+        '$or': [
+            {'sender_id': user_id, 'receiver_id': other_user_id},
+            {'sender_id': other_user_id, 'receiver_id': user_id}
+        ]
+    }
+
+def unread_filter(sender_id: int, receiver_id: int):
+    return {
+        'sender_id': sender_id,
+        'receiver_id': receiver_id,
+        'read': False
+    }
+
+def unread_counts_pipeline(receiver_id: int):
+    return [
+        {'$match': {'receiver_id': receiver_id, 'read': False}},
+        {'$group': {'_id': '$sender_id', 'count': {'$sum': 1}}}
+    ]
+
+def mark_read_update(read_at: Optional[datetime] = None):
+    return {
+        '$set': {
+            'read': True,
+            'read_at': read_at or datetime.utcnow()
+        }
+    }
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from sqlalchemy import text
+from app import database
+from app.metrics import Gauge
+
+load_dotenv()
+
+WARMUP_POSTGRES_CONNECTIONS = int(os.getenv("WARMUP_POSTGRES_CONNECTIONS", "2"))
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "1"))
+
+logger = logging.getLogger(__name__)
+
+IMPORTED_AT = time.monotonic()
+
+startup_seconds = Gauge("chat_startup_seconds", "Seconds from process start until the server accepted requests.")
+ready_seconds = Gauge("chat_ready_seconds", "Seconds from process start until both datastores were warmed up.")
+
+def process_uptime():
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            system_uptime = float(f.read().split()[0])
+        return system_uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - IMPORTED_AT
+
+def check_postgres():
+    from app.migrate import pending_migrations
+    connections = [database.engine.connect() for _ in range(WARMUP_POSTGRES_CONNECTIONS)]
+    try:
+        for connection in connections:
+            connection.execute(text("SELECT 1"))
+        pending = pending_migrations(connections[0])
+    finally:
+        for connection in connections:
+            connection.close()
+    if pending:
+        raise RuntimeError("pending migrations: " + ", ".join(migration.version for migration in pending))
+
+def check_mongo():
+    database.get_mongo_client().admin.command('ping')
+
+CHECKS = {"postgres": check_postgres, "mongo": check_mongo}
+
+class Readiness:
+    def __init__(self):
+        self.checks: Dict[str, Optional[str]] = {name: "pending" for name in CHECKS}
+        self.ready_after: Optional[float] = None
+
+    @property
+    def ready(self):
+        return self.ready_after is not None
+
+    async def warm_up(self):
+        remaining = list(CHECKS)
+        while remaining:
+            results = await asyncio.gather(
+                *(asyncio.to_thread(CHECKS[name]) for name in remaining), return_exceptions=True
+            )
+            failed = []
+            for name, result in zip(remaining, results):
+                if isinstance(result, Exception):
+                    if self.checks[name] != str(result):
+                        logger.warning("Warm-up check %s failed: %s", name, result)
+                    self.checks[name] = str(result)
+                    failed.append(name)
+                else:
+                    self.checks[name] = None
+            remaining = failed
+            if remaining:
+                await asyncio.sleep(WARMUP_RETRY_SECONDS)
+        self.ready_after = process_uptime()
+        ready_seconds.set(self.ready_after)
+        logger.info("Ready %.3fs after process start", self.ready_after)
+
+    def snapshot(self):
+        return {
+            "ready": self.ready,
+            "checks": {name: error or "ok" for name, error in self.checks.items()},
+            "ready_after_s": self.ready_after,
+        }
+
+readiness = Readiness()
+warmup_task: Optional[asyncio.Task] = None
+
+async def start_warm_up():
+    global warmup_task
+    if warmup_task is None:
+        warmup_task = asyncio.create_task(readiness.warm_up())
+
+async def stop_warm_up():
+    global warmup_task
+    if warmup_task:
+        warmup_task.cancel()
+        warmup_task = None
+
+def mark_started():
+    started = process_uptime()
+    startup_seconds.set(started)
+    return started
@@ -1,13 +1,100 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import User
-from app.schemas import UserCreate, UserLogin, UserResponse, Token
+from app.schemas import (
+    UserCreate, UserLogin, UserResponse, Token,
+    BulkRegisterRequest, BulkRegisterResponse
+)
 from app.auth_utils import create_access_token
+from app.versions import bump_directory
+from app.routers.users import get_current_user
+import asyncio
 import random
 
 router = APIRouter()
 
+BULK_INSERT_BATCH = 1000
+
+def default_username(mobile_number: str):
+    return f"User_{mobile_number[-4:]}"
+
+def insert_ignoring_existing(db: Session, rows):
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    inserted = {}
+    for start in range(0, len(rows), BULK_INSERT_BATCH):
+        statement = dialect.insert(User).values(rows[start:start + BULK_INSERT_BATCH])
+        statement = statement.on_conflict_do_nothing(index_elements=["mobile_number"])
+        for user_id, mobile_number in db.execute(statement.returning(User.id, User.mobile_number)):
+            inserted[mobile_number] = user_id
+    return inserted
+
+def bulk_register_users(db: Session, entries):
+    results = []
+    accepted = {}
+    for index, entry in enumerate(entries):
+        try:
+            user_data = UserCreate.model_validate(entry)
+        except ValidationError as exc:
+            mobile_number = entry.get("mobile_number")
+            results.append({
+                "index": index,
+                "mobile_number": mobile_number if isinstance(mobile_number, str) else None,
+                "status": "invalid",
+                "error": exc.errors()[0]["msg"]
+            })
+            continue
+        if user_data.mobile_number in accepted:
+            results.append({"index": index, "mobile_number": user_data.mobile_number, "status": "duplicate"})
+            continue
+        accepted[user_data.mobile_number] = user_data
+        results.append({"index": index, "mobile_number": user_data.mobile_number, "status": "pending"})
+    
+    existing = {}
+    if accepted:
+        existing = dict(db.execute(
+            select(User.mobile_number, User.id).where(User.mobile_number.in_(list(accepted)))
+        ).all())
+    
+    rows = []
+    for mobile_number, user_data in accepted.items():
+        if mobile_number in existing:
+            continue
+        user = User(
+            mobile_number=mobile_number,
+            username=user_data.username or default_username(mobile_number)
+        )
+        user.apply_identity_drift()
+        rows.append({
+            "mobile_number": user.mobile_number,
+            "username": user.username,
+            "is_active": True,
+            "identity_stability": user.identity_stability
+        })
+    inserted = insert_ignoring_existing(db, rows) if rows else {}
+    # Rows that lost an ON CONFLICT race to a concurrent registration
+    conflicted = [row["mobile_number"] for row in rows if row["mobile_number"] not in inserted]
+    if conflicted:
+        existing.update(db.execute(
+            select(User.mobile_number, User.id).where(User.mobile_number.in_(conflicted))
+        ).all())
+    db.commit()
+    
+    for result in results:
+        if result["status"] != "pending":
+            continue
+        mobile_number = result["mobile_number"]
+        if mobile_number in inserted:
+            result["status"] = "created"
+            result["id"] = inserted[mobile_number]
+        else:
+            result["status"] = "existing"
+            result["id"] = existing.get(mobile_number)
+    return results
+
 @router.post("/register", response_model=UserResponse)
 async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     existing_user = db.query(User).filter(User.mobile_number == user_data.mobile_number).first()
@@ -19,13 +106,14 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     
     new_user = User(
         mobile_number=user_data.mobile_number,
-        username=user_data.username or f"User_{user_data.mobile_number[-4:]}"
+        username=user_data.username or default_username(user_data.mobile_number)
     )
     new_user.apply_identity_drift()
     
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    bump_directory()
     
     return new_user
 
@@ -50,3 +138,25 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     access_token = create_access_token(data={"sub": str(user.id), "mobile": user.mobile_number})
     return {"access_token": access_token, "token_type": "bearer"}
 
+
+@router.post("/register/bulk", response_model=BulkRegisterResponse)
+async def register_bulk(
+    request: BulkRegisterRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    results = await asyncio.to_thread(bulk_register_users, db, request.users)
+    
+    totals = {"created": 0, "existing": 0, "duplicate": 0, "invalid": 0}
+    for result in results:
+        totals[result["status"]] += 1
+    if totals["created"]:
+        bump_directory()
+    
+    return {
+        "created": totals["created"],
+        "existing": totals["existing"],
+        "duplicate": totals["duplicate"],
+        "invalid": totals["invalid"],
+        "results": results
+    }
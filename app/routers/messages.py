@@ -1,44 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from urllib.parse import quote
 from app.database import get_db, get_mongo_db
 from app.models import User
-from app.schemas import MessageResponse
+from app.schemas import MessageResponse, UnreadCounts, AttachmentResponse
 from app.routers.users import get_current_user
-from datetime import datetime
-from typing import List
+from app.queries import unread_filter, unread_counts_pipeline, mark_read_update
+from app.archive import read_conversation, iter_conversation
+from app.sharding import message_shards
+from app.export import ndjson_chunks, parse_export_cursor, InvalidExportCursor
+from app.versions import get_conversation_version, bump_conversation, make_etag, etag_matches
+from app.attachments import (
+    attachment_store, attachment_summary, parse_range, ChunkedFileResponse,
+    AttachmentTooLarge, EmptyAttachment, RangeNotSatisfiable
+)
+from typing import List, Optional
+import asyncio
 
 router = APIRouter()
 
 @router.get("/history/{other_user_id}", response_model=List[MessageResponse])
 async def get_chat_history(
     other_user_id: int,
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    version = get_conversation_version(current_user.id, other_user_id)
+    etag = make_etag("c", current_user.id, other_user_id, version, skip, limit)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
     mongo_db = get_mongo_db()
     
-    messages = list(mongo_db.messages.find({
-        '$or': [
-            {'sender_id': current_user.id, 'receiver_id': other_user_id},
-            {'sender_id': other_user_id, 'receiver_id': current_user.id}
-        ]
-    }).sort('timestamp', 1).skip(skip).limit(limit))
-    
-    mongo_db.messages.update_many(
-        {
-            'sender_id': other_user_id,
-            'receiver_id': current_user.id,
-            'read': False
-        },
-        {
-            '$set': {
-                'read': True,
-                'read_at': datetime.utcnow()
-            }
-        }
-    )
+    messages = read_conversation(mongo_db, current_user.id, other_user_id, skip, limit)
+    
+    modified = 0
+    for collection in message_shards.collections_for(mongo_db, current_user.id, other_user_id):
+        modified += collection.update_many(
+            unread_filter(other_user_id, current_user.id),
+            mark_read_update()
+        ).modified_count
+    if modified:
+        bump_conversation(current_user.id, other_user_id)
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
     
     result = []
     for msg in messages:
@@ -49,8 +60,129 @@ async def get_chat_history(
             content=msg['content'],
             timestamp=msg['timestamp'],
             read=msg.get('read', False),
-            read_at=msg.get('read_at')
+            read_at=msg.get('read_at'),
+            attachment=msg.get('attachment')
         ))
     
     return result
 
+
+@router.get("/unread-counts", response_model=UnreadCounts)
+async def get_unread_counts(current_user: User = Depends(get_current_user)):
+    mongo_db = get_mongo_db()
+    counts = {}
+    for collection in message_shards.all_collections(mongo_db):
+        for row in collection.aggregate(unread_counts_pipeline(current_user.id)):
+            counts[row['_id']] = counts.get(row['_id'], 0) + row['count']
+    return {'counts': counts}
+
+
+@router.get("/export/{other_user_id}")
+async def export_conversation(
+    other_user_id: int,
+    after: Optional[str] = None,
+    gzip: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        resume_from = parse_export_cursor(after)
+    except InvalidExportCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid export cursor"
+        )
+    
+    messages = iter_conversation(get_mongo_db(), current_user.id, other_user_id, resume_from)
+    headers = {
+        "Cache-Control": "private, no-store",
+        "Content-Disposition": f'attachment; filename="conversation-{current_user.id}-{other_user_id}.ndjson"'
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        ndjson_chunks(messages, compress=gzip),
+        media_type="application/x-ndjson",
+        headers=headers
+    )
+
+
+@router.post("/attachments", response_model=AttachmentResponse, status_code=status.HTTP_201_CREATED)
+async def upload_attachment(
+    request: Request,
+    filename: str = Query(..., min_length=1, max_length=255),
+    current_user: User = Depends(get_current_user)
+):
+    declared_size = request.headers.get("content-length")
+    if declared_size and declared_size.isdigit() and int(declared_size) > attachment_store.max_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Attachment is too large"
+        )
+    content_type = request.headers.get("content-type") or "application/octet-stream"
+    try:
+        meta = await attachment_store.save(request.stream(), current_user.id, filename, content_type)
+    except AttachmentTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Attachment is too large"
+        )
+    except EmptyAttachment:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Attachment is empty"
+        )
+    return attachment_summary(meta)
+
+
+@router.get("/attachments/{attachment_id}")
+async def download_attachment(
+    attachment_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    meta = await asyncio.to_thread(attachment_store.load, attachment_id)
+    if meta is None or not attachment_store.can_read(meta, current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attachment not found"
+        )
+    
+    size = meta['size']
+    etag = f'"{meta["id"]}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(meta['filename'])}",
+        "X-Content-Type-Options": "nosniff"
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range is outside the attachment",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    
+    if byte_range is None:
+        start, end = 0, size - 1
+        status_code = status.HTTP_200_OK
+    else:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return ChunkedFileResponse(
+        attachment_store.spans(meta, start, end),
+        status_code=status_code,
+        headers=headers,
+        media_type=meta['content_type']
+    )
@@ -1,14 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import User
 from app.schemas import UserResponse
 from app.auth_utils import decode_token
+from app.versions import get_directory_version, make_etag, etag_matches
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from typing import List, Optional
+import re
 
 router = APIRouter()
 security = HTTPBearer()
 
+MAX_BATCH_IDS = 500
+
+def escape_like(value: str):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -33,6 +42,38 @@ def get_current_user(
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
     return current_user
 
+@router.get("/batch", response_model=list[UserResponse])
+async def get_users_batch(
+    ids: List[int] = Query(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    unique_ids = sorted(set(ids))
+    if len(unique_ids) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_IDS} ids per request"
+        )
+    return db.query(User).filter(User.id.in_(unique_ids)).order_by(User.id).all()
+
+@router.get("/search", response_model=list[UserResponse])
+async def search_users(
+    q: str = Query(..., min_length=1, max_length=50),
+    after_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    conditions = [func.lower(User.username).like(escape_like(q.strip().lower()) + "%")]
+    digits = re.sub(r'[\s\-\(\)\+]', '', q)
+    if digits.isdigit():
+        conditions.append(User.mobile_number.like(digits + "%"))
+    
+    query = db.query(User).filter(User.id != current_user.id, or_(*conditions))
+    if after_id is not None:
+        query = query.filter(User.id > after_id)
+    return query.order_by(User.id).limit(limit).all()
+
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     user = db.query(User).filter(User.id == user_id).first()
@@ -44,7 +85,29 @@ async def get_user(user_id: int, db: Session = Depends(get_db), current_user: Us
     return user
 
 @router.get("/", response_model=list[UserResponse])
-async def list_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    users = db.query(User).filter(User.id != current_user.id).offset(skip).limit(limit).all()
+async def list_users(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if after_id is not None and skip:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either skip or after_id, not both"
+        )
+    etag = make_etag("u", current_user.id, get_directory_version(), skip, limit, after_id)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    query = db.query(User).filter(User.id != current_user.id)
+    if after_id is not None:
+        query = query.filter(User.id > after_id)
+    users = query.order_by(User.id).offset(skip).limit(limit).all()
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
     return users
 
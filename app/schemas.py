@@ -1,8 +1,10 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 import re
 
+MAX_BULK_REGISTER_USERS = 10000
+
 class UserCreate(BaseModel):
     mobile_number: str = Field(..., min_length=10, max_length=15)
     username: Optional[str] = None
@@ -26,6 +28,23 @@ class UserCreate(BaseModel):
         
         return cleaned
 
+class BulkRegisterRequest(BaseModel):
+    users: List[Dict[str, Any]] = Field(..., min_length=1, max_length=MAX_BULK_REGISTER_USERS)
+
+class BulkRegisterResult(BaseModel):
+    index: int
+    mobile_number: Optional[str] = None
+    status: str
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkRegisterResponse(BaseModel):
+    created: int
+    existing: int
+    duplicate: int
+    invalid: int
+    results: List[BulkRegisterResult]
+
 class UserLogin(BaseModel):
     mobile_number: str
 
@@ -63,6 +82,12 @@ class MessageCreate(BaseModel):
     receiver_id: int
     content: str
 
+class AttachmentResponse(BaseModel):
+    id: str
+    filename: str
+    content_type: str
+    size: int
+
 class MessageResponse(BaseModel):
     id: str
     sender_id: int
@@ -71,6 +96,10 @@ class MessageResponse(BaseModel):
     timestamp: datetime
     read: bool
     read_at: Optional[datetime] = None
+    attachment: Optional[AttachmentResponse] = None
+
+class UnreadCounts(BaseModel):
+    counts: Dict[int, int]
 
 class TypingIndicator(BaseModel):
     user_id: int
@@ -0,0 +1,213 @@
+import argparse
+import hashlib
+import heapq
+import logging
+import os
+import sys
+from bisect import bisect
+from typing import List, Optional
+from dotenv import load_dotenv
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+from app.queries import conversation_filter
+
+load_dotenv()
+
+MESSAGE_SHARDS = os.getenv("MESSAGE_SHARDS", "1")
+MESSAGE_SHARDS_PREVIOUS = os.getenv("MESSAGE_SHARDS_PREVIOUS", "")
+SHARD_VIRTUAL_NODES = int(os.getenv("SHARD_VIRTUAL_NODES", "128"))
+REBALANCE_BATCH = int(os.getenv("REBALANCE_BATCH", "500"))
+
+DEFAULT_COLLECTION = "messages"
+DUPLICATE_KEY = 11000
+MESSAGE_ORDER = [('timestamp', ASCENDING), ('_id', ASCENDING)]
+# Equality on the conversation pair followed by MESSAGE_ORDER, so history sorts come from the index
+CONVERSATION_INDEX = [('sender_id', ASCENDING), ('receiver_id', ASCENDING)] + MESSAGE_ORDER
+LEGACY_CONVERSATION_INDEX = [('sender_id', ASCENDING), ('receiver_id', ASCENDING), ('timestamp', ASCENDING)]
+
+logger = logging.getLogger(__name__)
+
+def parse_shards(spec: str) -> List[str]:
+    spec = spec.strip()
+    if not spec:
+        return []
+    if spec.isdigit():
+        count = int(spec)
+        if count < 1:
+            raise ValueError("MESSAGE_SHARDS must be at least 1")
+        return [DEFAULT_COLLECTION] + [f"{DEFAULT_COLLECTION}_{i}" for i in range(1, count)]
+    names = [name.strip() for name in spec.split(",") if name.strip()]
+    if len(set(names)) != len(names):
+        raise ValueError("MESSAGE_SHARDS contains duplicate shard names")
+    return names
+
+def conversation_hash_key(user_id: int, other_user_id: int):
+    return f"{min(user_id, other_user_id)}:{max(user_id, other_user_id)}"
+
+def ring_hash(value: str):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+class HashRing:
+    def __init__(self, shards: List[str], virtual_nodes: int = SHARD_VIRTUAL_NODES):
+        if not shards:
+            raise ValueError("A hash ring needs at least one shard")
+        self.shards = list(shards)
+        points = sorted(
+            (ring_hash(f"{shard}#{replica}"), shard)
+            for shard in self.shards
+            for replica in range(virtual_nodes)
+        )
+        self.points = [point for point, _ in points]
+        self.owners = [shard for _, shard in points]
+
+    def shard_for(self, user_id: int, other_user_id: int):
+        if len(self.shards) == 1:
+            return self.shards[0]
+        position = bisect(self.points, ring_hash(conversation_hash_key(user_id, other_user_id)))
+        return self.owners[position % len(self.owners)]
+
+def shard_collection(mongo_db, name: str):
+    database_name, _, collection_name = name.rpartition(".")
+    if database_name:
+        return mongo_db.client[database_name][collection_name]
+    return mongo_db[collection_name]
+
+def ensure_message_indexes(collection):
+    collection.create_index(CONVERSATION_INDEX)
+    collection.create_index([('receiver_id', ASCENDING), ('read', ASCENDING), ('sender_id', ASCENDING)])
+
+def drop_index_if_exists(collection, keys):
+    for name, info in collection.index_information().items():
+        if [tuple(key) for key in info['key']] == keys:
+            collection.drop_index(name)
+
+def insert_ignoring_duplicates(collection, messages):
+    try:
+        collection.insert_many(messages, ordered=False)
+    except BulkWriteError as exc:
+        if any(error.get("code") != DUPLICATE_KEY for error in exc.details.get("writeErrors", [])):
+            raise
+
+class ShardRouter:
+    def __init__(self, shards: List[str], previous: Optional[List[str]] = None):
+        self.ring = HashRing(shards)
+        self.previous = HashRing(previous) if previous and previous != shards else None
+
+    @classmethod
+    def from_env(cls):
+        return cls(parse_shards(MESSAGE_SHARDS), parse_shards(MESSAGE_SHARDS_PREVIOUS))
+
+    @property
+    def shard_names(self):
+        names = list(self.ring.shards)
+        if self.previous:
+            names += [name for name in self.previous.shards if name not in names]
+        return names
+
+    def collection_for(self, mongo_db, user_id: int, other_user_id: int):
+        return shard_collection(mongo_db, self.ring.shard_for(user_id, other_user_id))
+
+    def collections_for(self, mongo_db, user_id: int, other_user_id: int):
+        names = [self.ring.shard_for(user_id, other_user_id)]
+        if self.previous:
+            previous = self.previous.shard_for(user_id, other_user_id)
+            if previous not in names:
+                names.append(previous)
+        return [shard_collection(mongo_db, name) for name in names]
+
+    def all_collections(self, mongo_db):
+        return [shard_collection(mongo_db, name) for name in self.shard_names]
+
+    def group_by_collection(self, mongo_db, messages):
+        groups = {}
+        for message in messages:
+            name = self.ring.shard_for(message['sender_id'], message['receiver_id'])
+            groups.setdefault(name, []).append(message)
+        return [(shard_collection(mongo_db, name), batch) for name, batch in groups.items()]
+
+    def find(self, mongo_db, user_id: int, other_user_id: int, query, skip: int = 0, limit: Optional[int] = None, batch_size: int = 0):
+        collections = self.collections_for(mongo_db, user_id, other_user_id)
+        if len(collections) == 1:
+            cursor = collections[0].find(query).sort(MESSAGE_ORDER).skip(skip)
+            if limit is not None:
+                cursor = cursor.limit(limit)
+            return cursor.batch_size(batch_size)
+        cursors = []
+        for collection in collections:
+            cursor = collection.find(query).sort(MESSAGE_ORDER).batch_size(batch_size)
+            if limit is not None:
+                cursor = cursor.limit(skip + limit)
+            cursors.append(cursor)
+        stop = None if limit is None else skip + limit
+        return _merge(cursors, skip, stop)
+
+    def insert_many(self, mongo_db, messages):
+        for collection, batch in self.group_by_collection(mongo_db, messages):
+            insert_ignoring_duplicates(collection, batch)
+
+def _merge(cursors, start, stop):
+    try:
+        yield from _slice(heapq.merge(*cursors, key=lambda msg: (msg['timestamp'], msg['_id'])), start, stop)
+    finally:
+        for cursor in cursors:
+            cursor.close()
+
+def _slice(iterator, start, stop):
+    for index, item in enumerate(iterator):
+        if stop is not None and index >= stop:
+            return
+        if index >= start:
+            yield item
+
+message_shards = ShardRouter.from_env()
+
+def rebalance(mongo_db, router: ShardRouter = None, dry_run: bool = False, batch_size: int = REBALANCE_BATCH):
+    router = router or message_shards
+    for collection in router.all_collections(mongo_db):
+        if not dry_run:
+            ensure_message_indexes(collection)
+    moved = {}
+    for name in router.shard_names:
+        source = shard_collection(mongo_db, name)
+        pairs = source.aggregate([{'$group': {'_id': {
+            'a': {'$min': ['$sender_id', '$receiver_id']},
+            'b': {'$max': ['$sender_id', '$receiver_id']}
+        }}}])
+        for pair in list(pairs):
+            user_id, other_user_id = pair['_id']['a'], pair['_id']['b']
+            owner = router.ring.shard_for(user_id, other_user_id)
+            if owner == name:
+                continue
+            key = f"{name} -> {owner}"
+            if dry_run:
+                moved[key] = moved.get(key, 0) + source.count_documents(conversation_filter(user_id, other_user_id))
+                continue
+            target = shard_collection(mongo_db, owner)
+            while True:
+                batch = list(source.find(conversation_filter(user_id, other_user_id)).limit(batch_size))
+                if not batch:
+                    break
+                insert_ignoring_duplicates(target, batch)
+                source.delete_many({'_id': {'$in': [msg['_id'] for msg in batch]}})
+                moved[key] = moved.get(key, 0) + len(batch)
+    return moved
+
+def main(argv=None):
+    from app.database import get_mongo_db
+
+    parser = argparse.ArgumentParser(description="Move messages to the shard that owns their conversation.")
+    parser.add_argument("--dry-run", action="store_true", help="only report how many messages would move")
+    parser.add_argument("--batch-size", type=int, default=REBALANCE_BATCH)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    moved = rebalance(get_mongo_db(), dry_run=args.dry_run, batch_size=args.batch_size)
+    verb = "would move" if args.dry_run else "moved"
+    for key, count in sorted(moved.items()):
+        print(f"{key}: {verb} {count} message(s)")
+    if not moved:
+        print("Every conversation is on its owning shard")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
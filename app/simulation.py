@@ -0,0 +1,86 @@
+import os
+import random
+from typing import Iterable, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TEMPORAL_WOBBLE = "temporal_wobble"
+ARTISTIC_CHRONOLOGY = "artistic_chronology"
+PHANTOM_TYPING = "phantom_typing"
+HARMONIC_SYNC = "harmonic_sync"
+
+ALL_FEATURES = (TEMPORAL_WOBBLE, ARTISTIC_CHRONOLOGY, PHANTOM_TYPING, HARMONIC_SYNC)
+
+PROFILES = {
+    "off": (),
+    "delivery": (TEMPORAL_WOBBLE, ARTISTIC_CHRONOLOGY),
+    "presence": (PHANTOM_TYPING, HARMONIC_SYNC),
+    "full": ALL_FEATURES,
+}
+
+class SimulationProfile:
+    def __init__(self, features: Iterable[str] = (), seed: Optional[int] = None):
+        features = frozenset(features)
+        unknown = features - set(ALL_FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown simulation features: {', '.join(sorted(unknown))}")
+        self.features = features
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.network_mood = "neutral"
+        self.temporal_wobble = TEMPORAL_WOBBLE in features
+        self.artistic_chronology = ARTISTIC_CHRONOLOGY in features
+        self.phantom_typing = PHANTOM_TYPING in features
+        self.harmonic_sync = HARMONIC_SYNC in features
+
+    @property
+    def enabled(self):
+        return bool(self.features)
+
+    def get_network_mood(self):
+        if self.rng.random() < 0.05:
+            self.network_mood = self.rng.choice(["calm", "neutral", "restless"])
+        return self.network_mood
+
+    def calculate_temporal_wobble(self):
+        mood = self.get_network_mood()
+        if mood == "calm":
+            base_delay = self.rng.uniform(0, 0.15)
+            wobble_factor = self.rng.choice([0.8, 1.0, 1.1])
+        elif mood == "restless":
+            base_delay = self.rng.uniform(0.05, 0.6)
+            wobble_factor = self.rng.choice([1.0, 1.2, 1.5])
+        else:
+            base_delay = self.rng.uniform(0, 0.4)
+            wobble_factor = self.rng.choice([0.9, 1.0, 1.3])
+        return base_delay * wobble_factor
+
+    def should_apply_artistic_chronology(self):
+        mood = self.get_network_mood()
+        probability = 0.1
+        if mood == "restless":
+            probability = 0.2
+        if mood == "calm":
+            probability = 0.05
+        return self.rng.random() < probability
+
+    def get_artistic_timestamp_adjustment(self):
+        return self.rng.uniform(-2, 2)
+
+def parse_profile(spec: Optional[str], seed: Optional[int] = None):
+    spec = (spec or "off").strip().lower()
+    features = set()
+    for name in filter(None, (part.strip() for part in spec.split(","))):
+        if name in PROFILES:
+            features.update(PROFILES[name])
+        else:
+            features.add(name)
+    return SimulationProfile(features, seed=seed)
+
+def load_simulation_profile():
+    seed = os.getenv("SIMULATION_SEED")
+    return parse_profile(
+        os.getenv("SIMULATION_PROFILE", "off"),
+        seed=int(seed) if seed else None
+    )
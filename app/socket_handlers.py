@@ -2,10 +2,19 @@ import socketio
 from app.database import get_mongo_db, SessionLocal
 from app.models import User
 from app.auth_utils import decode_token
+from app.simulation import load_simulation_profile
+from app.queries import mark_read_update
+from app.archive import read_conversation
+from app.metrics import Gauge, timed_event
+from app.versions import bump_conversation
+from app.spool import spool
+from app.admission import admission, AdmissionRejected
+from app.attachments import attachment_store, attachment_summary
+from app.sharding import message_shards
 from datetime import datetime
-import random
 import time
 import asyncio
+import os
 from typing import Dict
 from bson import ObjectId
 import json
@@ -30,42 +39,16 @@ def clean_message_for_json(msg):
 
 connected_users: Dict[int, str] = {}
 typing_users: Dict[int, Dict] = {}
-phantom_typing_active = False
 background_tasks_started = False
-network_mood = "neutral"
+simulation = load_simulation_profile()
 
-def get_network_mood():
-    global network_mood
-    if random.random() < 0.05:
-        network_mood = random.choice(["calm", "neutral", "restless"])
-    return network_mood
+Gauge("chat_connected_users", "Users with an open Socket.IO connection.", function=lambda: len(connected_users))
+Gauge("chat_typing_users", "Entries in the typing-indicator table.", function=lambda: len(typing_users))
 
-def calculate_temporal_wobble():
-    mood = get_network_mood()
-    if mood == "calm":
-        base_delay = random.uniform(0, 0.15)
-        wobble_factor = random.choice([0.8, 1.0, 1.1])
-    elif mood == "restless":
-        base_delay = random.uniform(0.05, 0.6)
-        wobble_factor = random.choice([1.0, 1.2, 1.5])
-    else:
-        base_delay = random.uniform(0, 0.4)
-        wobble_factor = random.choice([0.9, 1.0, 1.3])
-    return base_delay * wobble_factor
-
-def should_apply_artistic_chronology():
-    mood = get_network_mood()
-    probability = 0.1
-    if mood == "restless":
-        probability = 0.2
-    if mood == "calm":
-        probability = 0.05
-    return random.random() < probability
+PRESENCE_BROADCAST_INTERVAL = float(os.getenv("PRESENCE_BROADCAST_INTERVAL", "0.25"))
+presence_broadcast_pending = False
 
-def get_artistic_timestamp_adjustment():
-    return random.uniform(-2, 2)
-
-async def get_user_from_token(token: str):
+def load_user_from_token(token: str):
     payload = decode_token(token)
     if not payload:
         return None
@@ -77,21 +60,42 @@ async def get_user_from_token(token: str):
     finally:
         db.close()
 
+async def get_user_from_token(token: str):
+    return load_user_from_token(token)
+
+async def broadcast_online_users():
+    global presence_broadcast_pending
+    await asyncio.sleep(PRESENCE_BROADCAST_INTERVAL)
+    presence_broadcast_pending = False
+    await sio.emit('online_users', {'users': list(connected_users.keys())})
+
+def schedule_presence_broadcast():
+    global presence_broadcast_pending
+    if not presence_broadcast_pending:
+        presence_broadcast_pending = True
+        asyncio.create_task(broadcast_online_users())
+
 @sio.event
+@timed_event
 async def connect(sid, environ, auth):
     if not auth or 'token' not in auth:
         return False
     
-    user = await get_user_from_token(auth['token'])
+    try:
+        async with admission.admit():
+            user = await asyncio.to_thread(load_user_from_token, auth['token'])
+    except AdmissionRejected as exc:
+        raise socketio.exceptions.ConnectionRefusedError('Server busy', {'retry_after': exc.retry_after})
     if not user:
         return False
     
     connected_users[user.id] = sid
     await sio.emit('user_connected', {'user_id': user.id}, room=sid)
-    await sio.emit('online_users', {'users': list(connected_users.keys())}, skip_sid=sid)
+    schedule_presence_broadcast()
     return True
 
 @sio.event
+@timed_event
 async def disconnect(sid):
     user_id = None
     for uid, socket_id in connected_users.items():
@@ -104,9 +108,10 @@ async def disconnect(sid):
         if user_id in typing_users:
             del typing_users[user_id]
         await sio.emit('user_disconnected', {'user_id': user_id}, skip_sid=sid)
-        await sio.emit('online_users', {'users': list(connected_users.keys())})
+        schedule_presence_broadcast()
 
 @sio.event
+@timed_event
 async def send_message(sid, data):
     user = None
     for uid, socket_id in connected_users.items():
@@ -121,23 +126,34 @@ async def send_message(sid, data):
         return
     
     receiver_id = data.get('receiver_id')
-    content = data.get('content')
+    content = data.get('content') or ''
+    attachment_id = data.get('attachment_id')
     
-    if not receiver_id or not content:
+    if not receiver_id or not (content or attachment_id):
         await sio.emit('error', {'message': 'Invalid message data'}, room=sid)
         return
     
-    wobble_delay = calculate_temporal_wobble()
-    await asyncio.sleep(wobble_delay)
+    attachment = None
+    if attachment_id:
+        meta = await asyncio.to_thread(attachment_store.load, str(attachment_id))
+        if meta is None or meta['owner_id'] != user.id:
+            await sio.emit('error', {'message': 'Invalid attachment'}, room=sid)
+            return
+        await asyncio.to_thread(attachment_store.grant, meta['id'], receiver_id)
+        attachment = attachment_summary(meta)
+    
+    if simulation.temporal_wobble:
+        await asyncio.sleep(simulation.calculate_temporal_wobble())
     
     mongo_db = get_mongo_db()
     timestamp = datetime.utcnow()
     
-    if should_apply_artistic_chronology():
-        adjustment = get_artistic_timestamp_adjustment()
+    if simulation.artistic_chronology and simulation.should_apply_artistic_chronology():
+        adjustment = simulation.get_artistic_timestamp_adjustment()
         timestamp = datetime.fromtimestamp(timestamp.timestamp() + adjustment)
     
     message = {
+        '_id': ObjectId(),
         'sender_id': user.id,
         'receiver_id': receiver_id,
         'content': content,
@@ -145,20 +161,26 @@ async def send_message(sid, data):
         'read': False,
         'read_at': None
     }
+    if attachment:
+        message['attachment'] = attachment
     
-    result = mongo_db.messages.insert_one(message)
-    message['id'] = str(result.inserted_id)
-    message['timestamp'] = timestamp.isoformat()
+    if spool.is_open:
+        await spool.append(message)
+    else:
+        message_shards.collection_for(mongo_db, user.id, receiver_id).insert_one(message)
+    bump_conversation(user.id, receiver_id)
     
     cleaned_message = {
-        'id': message['id'],
+        'id': str(message['_id']),
         'sender_id': message['sender_id'],
         'receiver_id': message['receiver_id'],
         'content': message['content'],
-        'timestamp': message['timestamp'],
+        'timestamp': timestamp.isoformat(),
         'read': message['read'],
         'read_at': message['read_at']
     }
+    if attachment:
+        cleaned_message['attachment'] = attachment
     
     receiver_sid = connected_users.get(receiver_id)
     if receiver_sid:
@@ -167,6 +189,7 @@ async def send_message(sid, data):
     await sio.emit('message_sent', cleaned_message, room=sid)
 
 @sio.event
+@timed_event
 async def typing_start(sid, data):
     user = None
     for uid, socket_id in connected_users.items():
@@ -196,6 +219,7 @@ async def typing_start(sid, data):
         }, room=receiver_sid)
 
 @sio.event
+@timed_event
 async def typing_stop(sid, data):
     user = None
     for uid, socket_id in connected_users.items():
@@ -221,6 +245,7 @@ async def typing_stop(sid, data):
             }, room=receiver_sid)
 
 @sio.event
+@timed_event
 async def mark_read(sid, data):
     user = None
     for uid, socket_id in connected_users.items():
@@ -245,10 +270,23 @@ async def mark_read(sid, data):
     except:
         return
     
-    mongo_db.messages.update_one(
-        {'_id': message_object_id, 'receiver_id': user.id},
-        {'$set': {'read': True, 'read_at': datetime.utcnow()}}
-    )
+    # Check the journal first: an entry leaves it only after it has been written to MongoDB
+    updated = spool.mark_read(message_object_id, user.id) if spool.is_open else None
+    if updated is None:
+        if sender_id:
+            collections = message_shards.collections_for(mongo_db, user.id, sender_id)
+        else:
+            collections = message_shards.all_collections(mongo_db)
+        for collection in collections:
+            updated = collection.find_one_and_update(
+                {'_id': message_object_id, 'receiver_id': user.id},
+                mark_read_update(),
+                projection={'sender_id': 1}
+            )
+            if updated:
+                break
+    if updated:
+        bump_conversation(user.id, updated['sender_id'])
     
     if sender_id:
         sender_sid = connected_users.get(sender_id)
@@ -260,6 +298,7 @@ async def mark_read(sid, data):
             }, room=sender_sid)
 
 @sio.event
+@timed_event
 async def get_chat_history(sid, data):
     user = None
     for uid, socket_id in connected_users.items():
@@ -279,12 +318,7 @@ async def get_chat_history(sid, data):
         return
     
     mongo_db = get_mongo_db()
-    messages = list(mongo_db.messages.find({
-        '$or': [
-            {'sender_id': user.id, 'receiver_id': other_user_id},
-            {'sender_id': other_user_id, 'receiver_id': user.id}
-        ]
-    }).sort('timestamp', 1))
+    messages = read_conversation(mongo_db, user.id, other_user_id)
     
     cleaned_messages = []
     for msg in messages:
@@ -296,28 +330,30 @@ async def get_chat_history(sid, data):
     await sio.emit('chat_history', {'messages': cleaned_messages}, room=sid)
 
 async def phantom_typing_loop():
+    rng = simulation.rng
     while True:
-        await asyncio.sleep(random.uniform(30, 120))
-        if len(connected_users) >= 2 and random.random() < 0.3:
+        await asyncio.sleep(rng.uniform(30, 120))
+        if len(connected_users) >= 2 and rng.random() < 0.3:
             users_list = list(connected_users.keys())
             if len(users_list) >= 2:
-                phantom_user = random.choice(users_list)
+                phantom_user = rng.choice(users_list)
                 candidates = [u for u in users_list if u != phantom_user]
                 if not candidates:
                     continue
-                target_user = random.choice(candidates)
+                target_user = rng.choice(candidates)
                 target_sid = connected_users.get(target_user)
                 if target_sid:
                     await sio.emit("user_typing", {"user_id": phantom_user, "is_typing": True}, room=target_sid)
-                    await asyncio.sleep(random.uniform(2, 5))
+                    await asyncio.sleep(rng.uniform(2, 5))
                     await sio.emit("user_typing", {"user_id": phantom_user, "is_typing": False}, room=target_sid)
 
 async def harmonic_synchronization_loop():
+    rng = simulation.rng
     while True:
-        await asyncio.sleep(random.uniform(20, 60))
+        await asyncio.sleep(rng.uniform(20, 60))
         if connected_users:
-            phase = random.uniform(0, 1)
-            mood = get_network_mood()
+            phase = rng.uniform(0, 1)
+            mood = simulation.get_network_mood()
             await sio.emit(
                 "harmonic_sync",
                 {"users": list(connected_users.keys()), "phase": phase, "mood": mood}
@@ -328,5 +364,7 @@ async def start_background_tasks():
     if background_tasks_started:
         return
     background_tasks_started = True
-    asyncio.create_task(phantom_typing_loop())
-    asyncio.create_task(harmonic_synchronization_loop())
+    if simulation.phantom_typing:
+        asyncio.create_task(phantom_typing_loop())
+    if simulation.harmonic_sync:
+        asyncio.create_task(harmonic_synchronization_loop())
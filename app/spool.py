@@ -0,0 +1,256 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from typing import Optional
+from dotenv import load_dotenv
+from app.archive import encode_message, decode_message
+from app.database import get_mongo_db
+from app.metrics import Counter, Gauge, Histogram
+from app.queries import mark_read_update
+from app.sharding import message_shards
+from app.versions import bump_conversation
+
+load_dotenv()
+
+SPOOL_ENABLED = os.getenv("SPOOL_ENABLED", "true").lower() == "true"
+SPOOL_DIR = os.getenv("SPOOL_DIR", "data/spool")
+SPOOL_FSYNC = os.getenv("SPOOL_FSYNC", "always")
+SPOOL_FSYNC_INTERVAL_MS = float(os.getenv("SPOOL_FSYNC_INTERVAL_MS", "50"))
+SPOOL_DRAIN_BATCH = int(os.getenv("SPOOL_DRAIN_BATCH", "500"))
+SPOOL_ROTATE_BYTES = int(os.getenv("SPOOL_ROTATE_BYTES", str(64 * 1024 * 1024)))
+SPOOL_RETRY_SECONDS = float(os.getenv("SPOOL_RETRY_SECONDS", "1"))
+
+FSYNC_POLICIES = ("always", "interval", "off")
+
+RECORD_HEADER = struct.Struct("<II")
+CHECKPOINT = struct.Struct("<Q")
+
+logger = logging.getLogger(__name__)
+
+spool_fsync_duration = Histogram(
+    "chat_spool_fsync_seconds", "Time spent in fsync for the message journal.",
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+spool_drained = Counter("chat_spool_drained_total", "Journaled messages written to MongoDB.")
+spool_drain_errors = Counter("chat_spool_drain_errors_total", "Failed attempts to drain the journal into MongoDB.")
+
+class SpoolLocked(RuntimeError):
+    pass
+
+def frame(record):
+    payload = json.dumps(encode_message(record), separators=(",", ":"), default=str).encode()
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+def scan(data: bytes, offset: int = 0):
+    records = deque()
+    while offset + RECORD_HEADER.size <= len(data):
+        length, crc = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        offset = start + length
+        records.append((offset, decode_message(json.loads(payload))))
+    return records, offset
+
+class Spool:
+    def __init__(self, directory: str, fsync_policy: str = "always"):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"SPOOL_FSYNC must be one of {', '.join(FSYNC_POLICIES)}")
+        self.directory = directory
+        self.fsync_policy = fsync_policy
+        self.journal_path = os.path.join(directory, "journal.log")
+        self.checkpoint_path = os.path.join(directory, "checkpoint")
+        self.fd: Optional[int] = None
+        self.pending = deque()
+        self.unsent = {}
+        self.write_offset = 0
+        self.synced_offset = 0
+        self.checkpoint = 0
+        # Bumped on every truncation so that offsets from before a rotation are never trusted
+        self.generation = 0
+        self.sync_task: Optional[asyncio.Task] = None
+        self.new_data: Optional[asyncio.Event] = None
+
+    @property
+    def is_open(self):
+        return self.fd is not None
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(self.journal_path, os.O_RDWR | os.O_CREAT | os.O_APPEND)
+        try:
+            # One writer per journal: a second process would truncate and overwrite acknowledged frames
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise SpoolLocked(f"{self.journal_path} is in use by another process; give each process its own SPOOL_DIR")
+        try:
+            with open(self.checkpoint_path, "rb") as f:
+                self.checkpoint = CHECKPOINT.unpack(f.read(CHECKPOINT.size))[0]
+        except (FileNotFoundError, struct.error):
+            self.checkpoint = 0
+        with os.fdopen(os.dup(fd), "rb") as f:
+            data = f.read()
+        if self.checkpoint > len(data):
+            self.checkpoint = 0
+        self.pending, valid_end = scan(data, self.checkpoint)
+        self.unsent = {message['_id']: message for _, message in self.pending}
+        self.fd = fd
+        os.ftruncate(self.fd, valid_end)
+        self.write_offset = self.synced_offset = valid_end
+        self.new_data = asyncio.Event()
+        if self.pending:
+            self.new_data.set()
+        return len(self.pending)
+
+    def close(self):
+        if self.fd is not None:
+            os.fsync(self.fd)
+            os.close(self.fd)
+            self.fd = None
+
+    async def append(self, message):
+        data = frame(message)
+        view = memoryview(data)
+        written = 0
+        try:
+            while written < len(data):
+                written += os.write(self.fd, view[written:])
+        except OSError:
+            # Drop the torn frame so later frames are not hidden behind it on recovery
+            os.ftruncate(self.fd, self.write_offset)
+            raise
+        self.write_offset += len(data)
+        self.pending.append((self.write_offset, message))
+        self.unsent[message['_id']] = message
+        if self.fsync_policy == "always":
+            await self.sync(self.write_offset)
+        self.new_data.set()
+
+    async def sync(self, target: Optional[int] = None):
+        target = self.write_offset if target is None else target
+        generation = self.generation
+        # After a rotation the target's frames were already drained into MongoDB
+        while self.generation == generation and self.synced_offset < target:
+            if self.sync_task is None:
+                self.sync_task = asyncio.ensure_future(self._fsync())
+            await asyncio.shield(self.sync_task)
+
+    async def _fsync(self):
+        offset = self.write_offset
+        generation = self.generation
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(os.fsync, self.fd)
+            if self.generation == generation:
+                self.synced_offset = max(self.synced_offset, offset)
+        finally:
+            spool_fsync_duration.observe(time.perf_counter() - started)
+            self.sync_task = None
+
+    def mark_read(self, message_id, reader_id: int, read_at=None):
+        message = self.unsent.get(message_id)
+        if message is None or message['receiver_id'] != reader_id:
+            return None
+        message.update(mark_read_update(read_at)['$set'])
+        return message
+
+    def _write_checkpoint(self, offset: int):
+        temp_path = self.checkpoint_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(CHECKPOINT.pack(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.checkpoint_path)
+
+    async def drain_once(self, mongo_db):
+        if not self.pending:
+            return 0
+        if self.fsync_policy != "off":
+            await self.sync()
+        batch = [self.pending[i] for i in range(min(SPOOL_DRAIN_BATCH, len(self.pending)))]
+        await asyncio.to_thread(insert_idempotent, mongo_db, [message for _, message in batch])
+        read = [message for _, message in batch if message['read']]
+        if read:
+            # A receipt may have arrived while the insert was in flight
+            await asyncio.to_thread(apply_read_receipts, mongo_db, read)
+        for _, message in batch:
+            self.pending.popleft()
+            self.unsent.pop(message['_id'], None)
+        for _, message in batch:
+            bump_conversation(message['sender_id'], message['receiver_id'])
+        spool_drained.inc(len(batch))
+        self.checkpoint = batch[-1][0]
+        if not self.pending and self.write_offset >= SPOOL_ROTATE_BYTES:
+            os.ftruncate(self.fd, 0)
+            self.generation += 1
+            self.write_offset = self.synced_offset = self.checkpoint = 0
+        await asyncio.to_thread(self._write_checkpoint, self.checkpoint)
+        return len(batch)
+
+    async def drain_loop(self):
+        interval = SPOOL_FSYNC_INTERVAL_MS / 1000
+        while self.is_open:
+            try:
+                await asyncio.wait_for(self.new_data.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self.new_data.clear()
+            if self.fsync_policy == "interval" and self.synced_offset < self.write_offset:
+                await self.sync()
+            try:
+                while await self.drain_once(get_mongo_db()) == SPOOL_DRAIN_BATCH:
+                    pass
+            except Exception:
+                spool_drain_errors.inc()
+                logger.exception("Draining the message journal failed")
+                await asyncio.sleep(SPOOL_RETRY_SECONDS)
+                self.new_data.set()
+
+def insert_idempotent(mongo_db, messages):
+    message_shards.insert_many(mongo_db, messages)
+
+def apply_read_receipts(mongo_db, messages):
+    for message in messages:
+        message_shards.collection_for(mongo_db, message['sender_id'], message['receiver_id']).update_one(
+            {'_id': message['_id'], 'read': False},
+            mark_read_update(message['read_at'])
+        )
+
+spool = Spool(SPOOL_DIR, SPOOL_FSYNC)
+Gauge("chat_spool_pending_messages", "Journaled messages not yet written to MongoDB.", function=lambda: len(spool.pending))
+drain_task: Optional[asyncio.Task] = None
+
+async def start_spool():
+    global drain_task
+    if not SPOOL_ENABLED or spool.is_open:
+        return
+    try:
+        recovered = spool.open()
+    except SpoolLocked:
+        logger.warning("Message journal %s is locked by another process; writing messages directly to MongoDB", spool.journal_path)
+        return
+    if recovered:
+        logger.info("Recovered %d unsent messages from the journal", recovered)
+    drain_task = asyncio.create_task(spool.drain_loop())
+
+async def stop_spool():
+    global drain_task
+    if not spool.is_open:
+        return
+    if drain_task:
+        drain_task.cancel()
+        drain_task = None
+    try:
+        while spool.pending and await spool.drain_once(get_mongo_db()):
+            pass
+    except Exception:
+        logger.exception("Could not drain the message journal before shutdown")
+    spool.close()
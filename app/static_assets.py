@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from typing import Dict, NamedTuple, Optional
+from dotenv import load_dotenv
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse, Response
+from app.versions import etag_matches
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+load_dotenv()
+
+STATIC_DIR = os.getenv("STATIC_DIR", "static")
+STATIC_MAX_AGE_SECONDS = int(os.getenv("STATIC_MAX_AGE_SECONDS", "86400"))
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+ENCODING_SUFFIXES = {"br": "br", "gzip": "gz"}
+
+class StaticAsset(NamedTuple):
+    media_type: str
+    digest: str
+    variants: Dict[str, bytes]
+
+def build_asset(path: str):
+    with open(path, "rb") as f:
+        data = f.read()
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type == "application/javascript":
+        media_type += "; charset=utf-8"
+    variants = {"identity": data}
+    if media_type.startswith(COMPRESSIBLE_TYPES):
+        compressed = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed["br"] = brotli.compress(data, quality=11)
+        for encoding, body in compressed.items():
+            if len(body) < len(data):
+                variants[encoding] = body
+    return StaticAsset(media_type, hashlib.sha256(data).hexdigest()[:20], variants)
+
+def negotiate(accept_encoding: Optional[str], variants):
+    if not accept_encoding:
+        return "identity"
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[token.strip().lower()] = weight
+    accepted = [
+        encoding for encoding in ENCODING_SUFFIXES
+        if encoding in variants and weights.get(encoding, weights.get("*", 0.0)) > 0
+    ]
+    return min(accepted + ["identity"], key=lambda encoding: len(variants[encoding]))
+
+class StaticAssets:
+    def __init__(self, directory: str, max_age: int = STATIC_MAX_AGE_SECONDS):
+        self.directory = directory
+        self.cache_control = f"public, max-age={max_age}"
+        self.assets: Optional[Dict[str, StaticAsset]] = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        assets = {}
+        if os.path.isdir(self.directory):
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    assets[os.path.relpath(path, self.directory).replace(os.sep, "/")] = build_asset(path)
+        self.assets = assets
+        return len(assets)
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        if self.assets is None:
+            with self.lock:
+                if self.assets is None:
+                    self.load()
+        return self.assets.get(name)
+
+    def response(self, asset: StaticAsset, headers, cache_control: str):
+        encoding = negotiate(headers.get("accept-encoding"), asset.variants)
+        etag = f'"{asset.digest}-{ENCODING_SUFFIXES[encoding]}"' if encoding != "identity" else f'"{asset.digest}"'
+        response_headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+        if etag_matches(headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=response_headers)
+        return Response(asset.variants[encoding], headers=response_headers, media_type=asset.media_type)
+
+    async def __call__(self, scope, receive, send):
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+        else:
+            asset = self.get(scope["path"].lstrip("/"))
+            if asset is None:
+                response = PlainTextResponse("Not Found", status_code=404)
+            else:
+                response = self.response(asset, Headers(scope=scope), self.cache_control)
+        await response(scope, receive, send)
+
+static_assets = StaticAssets(STATIC_DIR)
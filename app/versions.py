@@ -0,0 +1,41 @@
+import uuid
+from typing import Dict, Optional, Tuple
+
+BOOT_EPOCH = uuid.uuid4().hex[:8]
+
+conversation_versions: Dict[Tuple[int, int], int] = {}
+directory_version = 0
+
+def conversation_key(user_id: int, other_user_id: int):
+    return (user_id, other_user_id) if user_id <= other_user_id else (other_user_id, user_id)
+
+def get_conversation_version(user_id: int, other_user_id: int):
+    return conversation_versions.get(conversation_key(user_id, other_user_id), 0)
+
+def bump_conversation(user_id: int, other_user_id: int):
+    key = conversation_key(user_id, other_user_id)
+    conversation_versions[key] = conversation_versions.get(key, 0) + 1
+
+def get_directory_version():
+    return directory_version
+
+def bump_directory():
+    global directory_version
+    directory_version += 1
+
+def make_etag(*parts):
+    return 'W/"' + "-".join(str(part) for part in (BOOT_EPOCH,) + parts) + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str):
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
@@ -0,0 +1,28 @@
+import os
+import tempfile
+import mongomock
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+from app import database
+from app.metrics import instrument_engine
+from app.migrate import migrate
+
+def install_local_backends():
+    scratch = tempfile.mkdtemp(prefix="chat-bench-")
+    os.environ.setdefault("SPOOL_DIR", os.path.join(scratch, "spool"))
+    os.environ.setdefault("ARCHIVE_DIR", os.path.join(scratch, "archive"))
+    os.environ.setdefault("ATTACHMENT_DIR", os.path.join(scratch, "attachments"))
+
+    engine = create_engine(
+        f"sqlite:///{os.path.join(scratch, 'users.db')}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+        poolclass=NullPool
+    )
+    instrument_engine(engine)
+    database.engine = engine
+    database.SessionLocal.configure(bind=engine)
+
+    database.mongo_client = mongomock.MongoClient()
+    database.mongo_db = database.mongo_client[database.MONGODB_DB]
+    migrate(engine, database.mongo_db)
+    return engine, database.mongo_db
@@ -0,0 +1,114 @@
+import argparse
+import json
+import platform
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+from bson import ObjectId
+
+from app.auth_utils import create_access_token, decode_token
+from app.queries import conversation_filter, unread_filter, mark_read_update
+from app.schemas import UserCreate, UserLogin, MessageResponse
+from app.socket_handlers import clean_message_for_json
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+def build_cases():
+    token = create_access_token(data={"sub": "42", "mobile": "1234567890"})
+    read_at = datetime(2024, 1, 15, 10, 30)
+    mongo_message = {
+        "_id": ObjectId(),
+        "sender_id": 1,
+        "receiver_id": 2,
+        "content": "Hello, how are you?",
+        "timestamp": datetime(2024, 1, 15, 10, 29),
+        "read": True,
+        "read_at": read_at,
+    }
+    response_fields = {
+        "id": str(mongo_message["_id"]),
+        "sender_id": 1,
+        "receiver_id": 2,
+        "content": "Hello, how are you?",
+        "timestamp": mongo_message["timestamp"],
+        "read": True,
+        "read_at": read_at,
+    }
+    return {
+        "create_access_token": lambda: create_access_token(data={"sub": "42", "mobile": "1234567890"}),
+        "decode_token": lambda: decode_token(token),
+        "decode_token_invalid": lambda: decode_token("not-a-token"),
+        "user_create_validate": lambda: UserCreate(mobile_number="+1 234-567-8901", username="bench"),
+        "user_login_validate": lambda: UserLogin(mobile_number="123-456-7890"),
+        "clean_message_for_json": lambda: clean_message_for_json(mongo_message),
+        "message_response": lambda: MessageResponse(**response_fields),
+        "conversation_filter": lambda: conversation_filter(1, 2),
+        "unread_filter": lambda: unread_filter(2, 1),
+        "mark_read_update": lambda: mark_read_update(read_at),
+    }
+
+def measure(func, repeat, min_time):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time / 0.2))
+    runs = timer.repeat(repeat=repeat, number=number)
+    return min(runs) / number * 1e9
+
+def run(names, repeat, min_time):
+    cases = build_cases()
+    results = {}
+    for name in names or cases:
+        if name not in cases:
+            raise SystemExit(f"unknown benchmark: {name}")
+        results[name] = measure(cases[name], repeat, min_time)
+        print(f"{name:<26}{results[name]:>12.0f} ns/op")
+    return results
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"\n{'benchmark':<26}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:<26}{'-':>12}{current:>12.0f}{'new':>10}")
+            continue
+        change = (current - previous) / previous
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{name:<26}{previous:>12.0f}{current:>12.0f}{change:>+10.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the server's per-request hot functions")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    parser.add_argument("--save", nargs="?", const=DEFAULT_BASELINE, type=Path, help="store results as the baseline")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, type=Path, help="compare against a baseline")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before flagging, e.g. 0.10 = 10%%")
+    args = parser.parse_args(argv)
+
+    results = run(args.names, args.repeat, args.min_time)
+
+    if args.save:
+        args.save.write_text(json.dumps({
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "created_at": datetime.utcnow().isoformat(),
+            "results_ns": results,
+        }, indent=2))
+        print(f"\nbaseline written to {args.save}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())["results_ns"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
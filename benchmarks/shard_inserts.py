@@ -0,0 +1,94 @@
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+from app.database import MONGODB_URI
+from app.sharding import ShardRouter, ensure_message_indexes, parse_shards
+
+BENCH_DB = "chat_shard_bench"
+
+def make_messages(count, conversations, seed):
+    rng = random.Random(seed)
+    pairs = [(rng.randrange(1, 100000), rng.randrange(100000, 200000)) for _ in range(conversations)]
+    messages = []
+    for i in range(count):
+        sender_id, receiver_id = rng.choice(pairs)
+        if i % 2:
+            sender_id, receiver_id = receiver_id, sender_id
+        messages.append({
+            '_id': ObjectId(),
+            'sender_id': sender_id,
+            'receiver_id': receiver_id,
+            'content': f'Benchmark message {i}',
+            'timestamp': datetime.utcnow(),
+            'read': False,
+            'read_at': None
+        })
+    return messages
+
+def run(client, shards, messages, writers, batch):
+    client.drop_database(BENCH_DB)
+    mongo_db = client[BENCH_DB]
+    router = ShardRouter(parse_shards(str(shards)))
+    for collection in router.all_collections(mongo_db):
+        ensure_message_indexes(collection)
+    batches = [messages[i:i + batch] for i in range(0, len(messages), batch)]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(lambda chunk: router.insert_many(mongo_db, chunk), batches))
+    elapsed = time.perf_counter() - started
+
+    per_shard = {collection.name: collection.estimated_document_count() for collection in router.all_collections(mongo_db)}
+    client.drop_database(BENCH_DB)
+    return {
+        "shards": shards,
+        "messages": len(messages),
+        "seconds": elapsed,
+        "inserts_per_s": len(messages) / elapsed if elapsed else 0.0,
+        "per_shard": per_shard,
+    }
+
+def main(args):
+    if args.local:
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        client = MongoClient(args.mongodb_uri, serverSelectionTimeoutMS=5000)
+    messages = make_messages(args.messages, args.conversations, args.seed)
+    results = []
+    for shards in args.shards:
+        results.append(run(client, shards, [dict(message) for message in messages], args.writers, args.batch))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    baseline = results[0]["inserts_per_s"]
+    print(f"messages: {args.messages}  conversations: {args.conversations}  writers: {args.writers}  batch: {args.batch}")
+    print(f"{'shards':>6} {'inserts/s':>11} {'speedup':>8}  spread (min/max docs per shard)")
+    for result in results:
+        counts = result["per_shard"].values()
+        speedup = result["inserts_per_s"] / baseline if baseline else 0.0
+        print(f"{result['shards']:>6} {result['inserts_per_s']:>11.0f} {speedup:>7.2f}x  {min(counts)}/{max(counts)}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Message insert throughput for different MESSAGE_SHARDS counts")
+    parser.add_argument("--shards", type=lambda v: [int(n) for n in v.split(",")], default=[1, 2, 4, 8])
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--conversations", type=int, default=5000)
+    parser.add_argument("--writers", type=int, default=16, help="concurrent insert threads")
+    parser.add_argument("--batch", type=int, default=100, help="messages per insert_many call before routing")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mongodb-uri", default=MONGODB_URI)
+    parser.add_argument("--local", action="store_true", help="use mongomock (smoke test only, numbers are meaningless)")
+    parser.add_argument("--json", action="store_true")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from itertools import count
+
+import httpx
+import socketio
+import uvicorn
+
+WORKLOADS = ("send", "typing", "history")
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(samples, elapsed):
+    return {
+        "count": len(samples),
+        "throughput_per_s": len(samples) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": max(samples) * 1000 if samples else 0.0,
+    }
+
+class Pending:
+    def __init__(self):
+        self.waiters = {}
+
+    def expect(self, key):
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[key] = future
+        return future
+
+    def resolve(self, key):
+        future = self.waiters.pop(key, None)
+        if future and not future.done():
+            future.set_result(time.perf_counter())
+
+class BenchClient:
+    def __init__(self, user_id, token, pending):
+        self.user_id = user_id
+        self.token = token
+        self.pending = pending
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.sio.on("new_message", self.on_new_message)
+        self.sio.on("user_typing", self.on_user_typing)
+        self.sio.on("chat_history", self.on_chat_history)
+
+    async def on_new_message(self, message):
+        self.pending.resolve(("send", message["content"]))
+
+    async def on_user_typing(self, data):
+        if data.get("is_typing"):
+            self.pending.resolve(("typing", data["user_id"], self.user_id))
+
+    async def on_chat_history(self, data):
+        self.pending.resolve(("history", self.user_id))
+
+    async def connect(self, url):
+        await self.sio.connect(url, auth={"token": self.token}, transports=["websocket"])
+
+async def start_server(host, port):
+    from app.main import app
+    config = uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="on")
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    return server, task
+
+async def provision_users(base_url, n_users, concurrency):
+    limiter = asyncio.Semaphore(concurrency)
+    run_id = int(time.time()) % 100000
+
+    async def provision(http, index):
+        mobile = f"9{run_id:05d}{index:05d}"
+        async with limiter:
+            response = await http.post("/api/auth/register", json={"mobile_number": mobile, "username": f"bench_{index}"})
+            response.raise_for_status()
+            user_id = response.json()["id"]
+            response = await http.post("/api/auth/login", json={"mobile_number": mobile})
+            response.raise_for_status()
+            return user_id, response.json()["access_token"]
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as http:
+        return await asyncio.gather(*(provision(http, i) for i in range(n_users)))
+
+async def connect_clients(base_url, credentials, concurrency, pending):
+    limiter = asyncio.Semaphore(concurrency)
+    clients = [BenchClient(user_id, token, pending) for user_id, token in credentials]
+
+    async def connect(client):
+        async with limiter:
+            await client.connect(base_url)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(connect(client) for client in clients))
+    return clients, time.perf_counter() - started
+
+async def run_workload(name, clients, pending, iterations, think_time, timeout):
+    samples = []
+    errors = 0
+    sequence = count()
+
+    async def one_op(client, peer):
+        if name == "send":
+            content = f"bench:{client.user_id}:{next(sequence)}"
+            waiter = pending.expect(("send", content))
+            started = time.perf_counter()
+            await client.sio.emit("send_message", {"token": client.token, "receiver_id": peer.user_id, "content": content})
+        elif name == "typing":
+            waiter = pending.expect(("typing", client.user_id, peer.user_id))
+            started = time.perf_counter()
+            await client.sio.emit("typing_start", {"token": client.token, "receiver_id": peer.user_id})
+        else:
+            waiter = pending.expect(("history", client.user_id))
+            started = time.perf_counter()
+            await client.sio.emit("get_chat_history", {"token": client.token, "other_user_id": peer.user_id})
+        finished = await asyncio.wait_for(waiter, timeout)
+        if name == "typing":
+            await client.sio.emit("typing_stop", {"token": client.token, "receiver_id": peer.user_id})
+        return finished - started
+
+    async def drive(index, client):
+        nonlocal errors
+        peer = clients[(index + 1) % len(clients)]
+        for _ in range(iterations):
+            try:
+                samples.append(await one_op(client, peer))
+            except asyncio.TimeoutError:
+                errors += 1
+            if think_time:
+                await asyncio.sleep(think_time)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(drive(i, client) for i, client in enumerate(clients)))
+    summary = summarize(samples, time.perf_counter() - started)
+    summary["errors"] = errors
+    return summary
+
+async def main(args):
+    if args.simulation_profile:
+        os.environ["SIMULATION_PROFILE"] = args.simulation_profile
+    if args.local:
+        from benchmarks.local_backends import install_local_backends
+        install_local_backends()
+
+    base_url = f"http://{args.host}:{args.port}"
+    server, server_task = await start_server(args.host, args.port)
+    pending = Pending()
+    clients = []
+    try:
+        credentials = await provision_users(base_url, args.users, args.concurrency)
+        clients, connect_elapsed = await connect_clients(base_url, credentials, args.concurrency, pending)
+        report = {
+            "users": args.users,
+            "connect": {
+                "elapsed_s": connect_elapsed,
+                "rate_per_s": len(clients) / connect_elapsed if connect_elapsed else 0.0,
+            },
+            "workloads": {},
+        }
+        for name in args.workloads:
+            report["workloads"][name] = await run_workload(
+                name, clients, pending, args.iterations, args.think_time, args.timeout
+            )
+    finally:
+        await asyncio.gather(*(client.sio.disconnect() for client in clients), return_exceptions=True)
+        server.should_exit = True
+        await server_task
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+def print_report(report):
+    connect = report["connect"]
+    print(f"users: {report['users']}")
+    print(f"connect: {connect['rate_per_s']:.1f} conn/s ({connect['elapsed_s']:.2f}s total)")
+    print(f"{'workload':<10}{'ops':>8}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, stats in report["workloads"].items():
+        print(
+            f"{name:<10}{stats['count']:>8}{stats['throughput_per_s']:>10.1f}"
+            f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['errors']:>8}"
+        )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Socket.IO load generator for app.main:app")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=20, help="operations per user per workload")
+    parser.add_argument("--workloads", type=lambda v: v.split(","), default=list(WORKLOADS))
+    parser.add_argument("--concurrency", type=int, default=50, help="parallel register/login/connect calls")
+    parser.add_argument("--think-time", type=float, default=0.0, help="seconds between operations per user")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for each reply")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--simulation-profile", default=None)
+    parser.add_argument("--local", action=argparse.BooleanOptionalAction, default=True,
+                        help="use in-process SQLite and mongomock instead of Postgres and MongoDB")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+    unknown = set(args.workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+    return args
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,32 @@
+import asyncio
+from app.admission import AdmissionController, AdmissionRejected
+
+def run_clients(controller, clients, hold):
+    async def client():
+        try:
+            async with controller.admit():
+                await asyncio.sleep(hold)
+            return "admitted"
+        except AdmissionRejected as exc:
+            assert controller.retry_min <= exc.retry_after <= controller.retry_max
+            return exc.reason
+
+    async def scenario():
+        return await asyncio.gather(*(client() for _ in range(clients)))
+    return asyncio.run(scenario())
+
+def test_excess_connects_are_rejected_when_queue_is_full():
+    controller = AdmissionController(max_concurrent=2, max_queue=3, max_wait=5, seed=1)
+    results = run_clients(controller, 8, 0.05)
+
+    assert results.count("admitted") == 5
+    assert results.count("queue_full") == 3
+    assert controller.waiting == 0
+    assert controller.active == 0
+
+def test_queued_connects_time_out():
+    controller = AdmissionController(max_concurrent=1, max_queue=10, max_wait=0.05, seed=1)
+    results = run_clients(controller, 3, 0.2)
+
+    assert results == ["admitted", "timeout", "timeout"]
+    assert not controller.semaphore.locked()
@@ -0,0 +1,81 @@
+import mongomock
+import pytest
+from datetime import datetime, timedelta
+from bson import ObjectId
+from app import archive
+from app.archive import ColdStore, archive_conversation, archive_once, read_conversation
+from app.database import get_mongo_db
+
+def make_messages(count, start, sender_id=1, receiver_id=2):
+    return [
+        {
+            '_id': ObjectId(),
+            'sender_id': sender_id if i % 2 == 0 else receiver_id,
+            'receiver_id': receiver_id if i % 2 == 0 else sender_id,
+            'content': f'Message {i}',
+            'timestamp': start + timedelta(seconds=i),
+            'read': True,
+            'read_at': start + timedelta(seconds=i, milliseconds=500)
+        }
+        for i in range(count)
+    ]
+
+def test_cold_store_round_trip_across_blocks(tmp_path):
+    store = ColdStore(str(tmp_path))
+    messages = make_messages(25, datetime(2024, 1, 1))
+    for start in range(0, 25, 10):
+        store.append(2, 1, messages[start:start + 10])
+    
+    assert store.count(1, 2) == 25
+    assert store.last_timestamp(1, 2) == messages[-1]['timestamp']
+    assert store.read(1, 2) == messages
+    assert store.read(2, 1, skip=8, limit=5) == messages[8:13]
+    assert store.read(1, 2, skip=30) == []
+
+def test_cold_store_reloads_index_from_disk(tmp_path):
+    messages = make_messages(5, datetime(2024, 1, 1))
+    ColdStore(str(tmp_path)).append(1, 2, messages)
+    
+    with open(tmp_path / "1_2.idx", "ab") as idx:
+        idx.write(b"torn")
+    reopened = ColdStore(str(tmp_path))
+    assert reopened.count(1, 2) == 5
+    assert reopened.read(1, 2, skip=3) == messages[3:]
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "cold_store", ColdStore(str(tmp_path)))
+    mongo_db = get_mongo_db()
+    yield
+    mongo_db.messages.delete_many({})
+
+def test_history_reads_both_tiers(archive_dir):
+    mongo_db = get_mongo_db()
+    old = make_messages(6, datetime.utcnow().replace(microsecond=0) - timedelta(days=30))
+    recent = make_messages(4, datetime.utcnow().replace(microsecond=0) - timedelta(minutes=5))
+    mongo_db.messages.insert_many(old + recent)
+    
+    archived = archive_conversation(mongo_db, 2, 1, datetime.utcnow() - timedelta(days=7), block_size=4)
+    assert archived == 6
+    assert mongo_db.messages.count_documents({}) == 4
+    
+    contents = [msg['content'] for msg in read_conversation(mongo_db, 1, 2)]
+    assert contents == [msg['content'] for msg in old + recent]
+    page = read_conversation(mongo_db, 1, 2, skip=4, limit=4)
+    assert [msg['_id'] for msg in page] == [msg['_id'] for msg in (old + recent)[4:8]]
+
+def test_archiving_stops_at_oldest_unread_message(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "cold_store", ColdStore(str(tmp_path)))
+    mongo_db = mongomock.MongoClient().db
+    old = make_messages(6, datetime.utcnow().replace(microsecond=0) - timedelta(days=30))
+    old[3]['read'] = False
+    old[3]['read_at'] = None
+    mongo_db.messages.insert_many(old)
+    
+    assert archive_once(mongo_db, timedelta(days=7)) == 3
+    assert sorted(msg['_id'] for msg in mongo_db.messages.find()) == sorted(msg['_id'] for msg in old[3:])
+    assert [msg['_id'] for msg in read_conversation(mongo_db, 1, 2)] == [msg['_id'] for msg in old]
+    
+    mongo_db.messages.update_one({'_id': old[3]['_id']}, {'$set': {'read': True}})
+    assert archive_once(mongo_db, timedelta(days=7)) == 3
+    assert mongo_db.messages.count_documents({}) == 0
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import pytest
+from app.attachments import AttachmentStore, ChunkedFileResponse, AttachmentTooLarge, RangeNotSatisfiable, parse_range
+
+async def body(data, piece=700):
+    for i in range(0, len(data), piece):
+        yield data[i:i + piece]
+
+def collect(response, extensions=None):
+    messages = []
+
+    async def send(message):
+        if message["type"] == "http.response.zerocopy":
+            message["file"].seek(message["offset"])
+            message = {"type": "http.response.body", "body": message["file"].read(message["count"])}
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "extensions": extensions or {}}
+    asyncio.run(response(scope, None, send))
+    return b"".join(message.get("body", b"") for message in messages[1:])
+
+def test_upload_is_split_into_chunks(tmp_path):
+    store = AttachmentStore(str(tmp_path), chunk_size=1000)
+    data = os.urandom(3500)
+    meta = asyncio.run(store.save(body(data), 1, "photo.jpg", "image/jpeg"))
+
+    assert meta['size'] == 3500
+    assert store.load(meta['id']) == meta
+    chunks = sorted(name for name in os.listdir(store._path(meta['id'])) if name.endswith(".chunk"))
+    assert len(chunks) == 4
+
+    spans = store.spans(meta, 990, 2010)
+    assert [(offset, count) for _, offset, count in spans] == [(990, 10), (0, 1000), (0, 11)]
+    assert collect(ChunkedFileResponse(spans)) == data[990:2011]
+    assert collect(ChunkedFileResponse(spans), {"http.response.zerocopy": {}}) == data[990:2011]
+
+def test_oversized_upload_leaves_nothing_behind(tmp_path):
+    store = AttachmentStore(str(tmp_path), chunk_size=1000, max_size=2000)
+    with pytest.raises(AttachmentTooLarge):
+        asyncio.run(store.save(body(os.urandom(3500)), 1, "big.bin", "application/octet-stream"))
+    assert not any(files for _, _, files in os.walk(tmp_path))
+
+def test_only_owner_and_recipients_can_read(tmp_path):
+    store = AttachmentStore(str(tmp_path))
+    meta = asyncio.run(store.save(body(b"hello"), 1, "note.txt", "text/plain"))
+    assert not store.can_read(meta, 2)
+    assert store.can_read(store.grant(meta['id'], 2), 2)
+    assert store.load("../../etc") is None
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=10-19", 100) == (10, 19)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=100-", 100)
@@ -3,6 +3,8 @@ from fastapi.testclient import TestClient
 from app.main import app
 from app.database import SessionLocal, engine, Base
 from app.models import User
+from app.auth_utils import create_access_token
+from app.routers import auth as auth_router
 
 client = TestClient(app)
 
@@ -85,3 +87,65 @@ def test_login_mobile_validation():
     )
     assert response.status_code == 422
 
+
+def test_register_bulk_reports_per_row_results():
+    admin = client.post(
+        "/api/auth/register",
+        json={"mobile_number": "1234567890", "username": "Admin"}
+    ).json()
+    token = create_access_token(data={"sub": str(admin["id"]), "mobile": admin["mobile_number"]})
+    
+    response = client.post(
+        "/api/auth/register/bulk",
+        json={"users": [
+            {"mobile_number": "1234567890"},
+            {"mobile_number": "+1 234-567-8901", "username": "NewUser"},
+            {"mobile_number": "12345678901"},
+            {"mobile_number": "12345abc678"}
+        ]},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["created"], data["existing"], data["duplicate"], data["invalid"]) == (1, 1, 1, 1)
+    assert [result["status"] for result in data["results"]] == ["existing", "created", "duplicate", "invalid"]
+    assert data["results"][0]["id"] == admin["id"]
+    
+    login = client.post("/api/auth/login", json={"mobile_number": "12345678901"})
+    assert login.status_code == 200
+
+def test_register_bulk_requires_authentication():
+    response = client.post(
+        "/api/auth/register/bulk",
+        json={"users": [{"mobile_number": "1234567890"}]}
+    )
+    assert response.status_code == 403
+
+def test_register_bulk_reports_id_for_rows_lost_to_concurrent_insert(monkeypatch):
+    insert = auth_router.insert_ignoring_existing
+    racer = {}
+    
+    def concurrent_insert(db, rows):
+        other = SessionLocal()
+        try:
+            user = User(mobile_number=rows[0]["mobile_number"], username="Racer")
+            other.add(user)
+            other.commit()
+            racer["id"] = user.id
+        finally:
+            other.close()
+        return insert(db, rows)
+    
+    monkeypatch.setattr(auth_router, "insert_ignoring_existing", concurrent_insert)
+    db = SessionLocal()
+    try:
+        results = auth_router.bulk_register_users(db, [
+            {"mobile_number": "1234567890"},
+            {"mobile_number": "12345678901"}
+        ])
+    finally:
+        db.close()
+    
+    assert [result["status"] for result in results] == ["existing", "created"]
+    assert results[0]["id"] == racer["id"]
+    assert results[1]["id"] is not None
@@ -0,0 +1,59 @@
+import json
+import zlib
+import mongomock
+import pytest
+from datetime import datetime
+from bson import ObjectId
+from app import archive
+from app.archive import ColdStore, iter_conversation
+from app.export import ndjson_chunks, export_cursor, parse_export_cursor, InvalidExportCursor
+from app.sharding import ShardRouter, parse_shards
+
+def make_messages(count):
+    return [{
+        '_id': ObjectId(),
+        'sender_id': 1,
+        'receiver_id': 2,
+        'content': f'Message {i}',
+        'timestamp': datetime(2024, 1, 1, 12, 0, i % 60),
+        'read': False,
+        'read_at': None
+    } for i in range(count)]
+
+def test_ndjson_is_emitted_in_batches():
+    messages = make_messages(25)
+    chunks = list(ndjson_chunks(iter(messages), batch_size=10))
+    
+    assert len(chunks) == 3
+    lines = b"".join(chunks).decode().splitlines()
+    assert [json.loads(line)['content'] for line in lines] == [msg['content'] for msg in messages]
+
+def test_gzip_output_decompresses_to_ndjson():
+    messages = make_messages(25)
+    plain = b"".join(ndjson_chunks(iter(messages), batch_size=10))
+    compressed = b"".join(ndjson_chunks(iter(messages), compress=True, batch_size=10))
+    
+    assert zlib.decompress(compressed, 31) == plain
+
+def test_cursor_round_trip():
+    message = make_messages(1)[0]
+    assert parse_export_cursor(export_cursor(message)) == (message['timestamp'], message['_id'])
+    assert parse_export_cursor(None) is None
+    with pytest.raises(InvalidExportCursor):
+        parse_export_cursor("not-a-cursor")
+
+def test_abandoned_export_closes_every_shard_cursor(tmp_path, monkeypatch):
+    router = ShardRouter(parse_shards("2"), previous=parse_shards("1"))
+    other_user_id = next(user_id for user_id in range(3, 100) if router.ring.shard_for(1, user_id) != "messages")
+    mongo_db = mongomock.MongoClient().db
+    for collection in router.collections_for(mongo_db, 1, other_user_id):
+        collection.insert_many([dict(msg, receiver_id=other_user_id, _id=ObjectId()) for msg in make_messages(5)])
+    closed = []
+    monkeypatch.setattr(mongomock.collection.Cursor, "close", lambda cursor: closed.append(cursor))
+    monkeypatch.setattr(archive, "message_shards", router)
+    monkeypatch.setattr(archive, "cold_store", ColdStore(str(tmp_path)))
+    
+    stream = iter_conversation(mongo_db, 1, other_user_id, batch_size=2)
+    next(stream)
+    stream.close()
+    assert len(closed) == 2
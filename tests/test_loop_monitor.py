@@ -0,0 +1,84 @@
+import asyncio
+import sys
+import time
+from datetime import datetime
+import httpx
+import mongomock
+from app import queries
+from app.routers.users import get_current_user
+from app.loop_monitor import LoopMonitor, describe_stack
+from app.main import app, fastapi_app
+from app.routers import messages
+
+def test_describe_stack_names_blocking_handler_and_call(monkeypatch):
+    captured = {}
+
+    class BlockingClock:
+        @staticmethod
+        def utcnow():
+            captured["frame"] = sys._getframe()
+            return datetime.utcnow()
+
+    monkeypatch.setattr(queries, "datetime", BlockingClock)
+    queries.mark_read_update()
+
+    stall = describe_stack(captured["frame"])
+    assert stall["handler"] == "mark_read_update"
+    assert stall["site"].startswith("app/queries.py:")
+    assert stall["call"].endswith("test_loop_monitor.py:utcnow")
+
+def test_monitor_records_stall_with_duration():
+    async def scenario():
+        monitor = LoopMonitor(interval=0.01, threshold=0.05, history=5)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.25)
+        await asyncio.sleep(0.05)
+        monitor.stop()
+        return monitor.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert len(snapshot["stalls"]) == 1
+    stall = snapshot["stalls"][0]
+    assert stall["duration_s"] >= 0.2
+    assert any("test_loop_monitor.py" in line for line in stall["stack"])
+
+def test_route_stall_is_attributed_to_endpoint_not_middleware(monkeypatch):
+    mongo_db = mongomock.MongoClient().db
+    blocking = []
+
+    def blocking_mongo_db():
+        if blocking:
+            time.sleep(0.25)
+        return mongo_db
+
+    monkeypatch.setattr(messages, "get_mongo_db", blocking_mongo_db)
+    fastapi_app.dependency_overrides[get_current_user] = lambda: type("User", (), {"id": 1})()
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            # Warm the route up first so one-off setup cannot open a stall that swallows ours
+            await client.get("/api/messages/unread-counts")
+            monitor = LoopMonitor(interval=0.01, threshold=0.05, history=5)
+            monitor.start()
+            await asyncio.sleep(0.05)
+            blocking.append(True)
+            response = await client.get("/api/messages/unread-counts")
+            await asyncio.sleep(0.05)
+        monitor.stop()
+        return response, monitor.snapshot()
+
+    try:
+        response, snapshot = asyncio.run(scenario())
+    finally:
+        fastapi_app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    ours = [stall for stall in snapshot["stalls"] if any("blocking_mongo_db" in line for line in stall["stack"])]
+    assert [stall["handler"] for stall in ours] == ["get_unread_counts"]
+
+def test_debug_endpoint_is_disabled_by_default():
+    from fastapi.testclient import TestClient
+
+    response = TestClient(app).get("/debug/loop-stalls")
+    assert response.status_code == 404
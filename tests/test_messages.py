@@ -5,6 +5,7 @@ from app.database import SessionLocal, engine, Base, get_mongo_db
 from app.models import User
 from app.auth_utils import create_access_token
 from datetime import datetime
+import json
 
 client = TestClient(app)
 
@@ -116,3 +117,111 @@ def test_get_chat_history_marks_messages_as_read(auth_token, second_user):
     assert updated_message['read'] == True
     assert updated_message['read_at'] is not None
 
+
+def test_unread_counts_groups_by_sender_without_marking_read(auth_token, second_user):
+    token, user_id = auth_token
+    
+    mongo_db = get_mongo_db()
+    mongo_db.messages.insert_many([
+        {
+            'sender_id': second_user,
+            'receiver_id': user_id,
+            'content': f'Unread {i}',
+            'timestamp': datetime.utcnow(),
+            'read': False,
+            'read_at': None
+        }
+        for i in range(3)
+    ] + [{
+        'sender_id': user_id,
+        'receiver_id': second_user,
+        'content': 'Outgoing',
+        'timestamp': datetime.utcnow(),
+        'read': False,
+        'read_at': None
+    }])
+    
+    response = client.get(
+        "/api/messages/unread-counts",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert response.json()["counts"] == {str(second_user): 3}
+    assert mongo_db.messages.count_documents({'receiver_id': user_id, 'read': False}) == 3
+
+def test_get_chat_history_conditional_get(auth_token, second_user):
+    token, user_id = auth_token
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    first = client.get(f"/api/messages/history/{second_user}", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    
+    unchanged = client.get(
+        f"/api/messages/history/{second_user}",
+        headers={**headers, "If-None-Match": etag}
+    )
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    assert unchanged.headers["etag"] == etag
+
+def test_attachment_upload_and_range_download(auth_token, second_user):
+    token, user_id = auth_token
+    headers = {"Authorization": f"Bearer {token}"}
+    data = bytes(range(256)) * 40
+    
+    upload = client.post(
+        "/api/messages/attachments?filename=notes.bin",
+        content=data,
+        headers={**headers, "Content-Type": "application/octet-stream"}
+    )
+    assert upload.status_code == 201
+    attachment = upload.json()
+    assert attachment["size"] == len(data)
+    
+    full = client.get(f"/api/messages/attachments/{attachment['id']}", headers=headers)
+    assert full.status_code == 200
+    assert full.content == data
+    assert full.headers["accept-ranges"] == "bytes"
+    
+    partial = client.get(
+        f"/api/messages/attachments/{attachment['id']}",
+        headers={**headers, "Range": "bytes=100-199"}
+    )
+    assert partial.status_code == 206
+    assert partial.content == data[100:200]
+    assert partial.headers["content-range"] == f"bytes 100-199/{len(data)}"
+    
+    other_token = create_access_token(data={"sub": str(second_user), "mobile": "0987654321"})
+    denied = client.get(
+        f"/api/messages/attachments/{attachment['id']}",
+        headers={"Authorization": f"Bearer {other_token}"}
+    )
+    assert denied.status_code == 404
+
+def test_export_conversation_resumes_from_cursor(auth_token, second_user):
+    token, user_id = auth_token
+    headers = {"Authorization": f"Bearer {token}"}
+    mongo_db = get_mongo_db()
+    mongo_db.messages.insert_many([{
+        'sender_id': user_id,
+        'receiver_id': second_user,
+        'content': f'Message {i}',
+        'timestamp': datetime(2024, 1, 1, 12, 0, i),
+        'read': False,
+        'read_at': None
+    } for i in range(5)])
+    
+    response = client.get(f"/api/messages/export/{second_user}", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["content"] for line in lines] == [f"Message {i}" for i in range(5)]
+    
+    resumed = client.get(
+        f"/api/messages/export/{second_user}",
+        params={"after": lines[1]["cursor"], "gzip": "true"},
+        headers=headers
+    )
+    assert resumed.headers["content-encoding"] == "gzip"
+    assert [json.loads(line)["content"] for line in resumed.text.splitlines()] == [f"Message {i}" for i in range(2, 5)]
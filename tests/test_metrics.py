@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+import socketio
+from fastapi.testclient import TestClient
+from app.main import app
+from app.metrics import Histogram, Counter, REGISTRY, render_latest, socket_event_errors, timed_event
+
+client = TestClient(app)
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_latency_seconds", "Test latency.", ("route",), buckets=(0.1, 1.0))
+    try:
+        child = histogram.labels("/x")
+        child.observe(0.05)
+        child.observe(0.5)
+        child.observe(5)
+        text = "\n".join(histogram.render())
+        assert 'test_latency_seconds_bucket{route="/x",le="0.1"} 1' in text
+        assert 'test_latency_seconds_bucket{route="/x",le="1.0"} 2' in text
+        assert 'test_latency_seconds_bucket{route="/x",le="+Inf"} 3' in text
+        assert 'test_latency_seconds_count{route="/x"} 3' in text
+    finally:
+        REGISTRY.remove(histogram)
+
+def test_counter_escapes_label_values():
+    counter = Counter("test_events_total", "Test events.", ("name",))
+    try:
+        counter.labels('a"b').inc(2)
+        assert 'test_events_total{name="a\\"b"} 2.0' in render_latest()
+    finally:
+        REGISTRY.remove(counter)
+
+def test_metrics_endpoint_reports_route_latency():
+    client.get("/metrics")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'chat_http_request_duration_seconds_count{method="GET",route="/metrics"}' in response.text
+    assert "chat_connected_users 0.0" in response.text
+    assert "# TYPE chat_socket_event_duration_seconds histogram" in response.text
+
+def test_refused_connects_are_not_counted_as_errors():
+    @timed_event
+    async def refused_event(sid):
+        raise socketio.exceptions.ConnectionRefusedError('Server busy')
+
+    @timed_event
+    async def failing_event(sid):
+        raise RuntimeError('boom')
+
+    with pytest.raises(socketio.exceptions.ConnectionRefusedError):
+        asyncio.run(refused_event("sid"))
+    with pytest.raises(RuntimeError):
+        asyncio.run(failing_event("sid"))
+    assert socket_event_errors.labels("refused_event").value == 0
+    assert socket_event_errors.labels("failing_event").value == 1
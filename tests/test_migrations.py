@@ -0,0 +1,53 @@
+import asyncio
+import mongomock
+from sqlalchemy import create_engine, inspect
+from app import migrate as migrate_module, readiness as readiness_module
+from app.database import get_mongo_db
+from app.migrate import MIGRATIONS, conversation_order_indexes, migrate, pending_migrations
+from app.readiness import Readiness
+from app.sharding import CONVERSATION_INDEX, LEGACY_CONVERSATION_INDEX, ShardRouter, parse_shards
+
+def test_migration_versions_are_ordered_and_unique():
+    versions = [migration.version for migration in MIGRATIONS]
+    assert versions == sorted(set(versions))
+
+def test_migrate_is_idempotent(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    mongo_db = get_mongo_db()
+    
+    assert migrate(engine, mongo_db) == [migration.version for migration in MIGRATIONS]
+    assert migrate(engine, mongo_db) == []
+    with engine.connect() as connection:
+        assert pending_migrations(connection) == []
+    assert inspect(engine).has_table("users")
+
+def test_readiness_retries_until_all_checks_pass(monkeypatch):
+    attempts = []
+    
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("not yet")
+    
+    monkeypatch.setattr(readiness_module, "CHECKS", {"postgres": flaky, "mongo": lambda: None})
+    monkeypatch.setattr(readiness_module, "WARMUP_RETRY_SECONDS", 0)
+    readiness = Readiness()
+    assert not readiness.ready
+    
+    asyncio.run(readiness.warm_up())
+    assert readiness.ready
+    assert len(attempts) == 3
+    assert readiness.snapshot()["checks"] == {"postgres": "ok", "mongo": "ok"}
+
+def test_conversation_order_index_replaces_timestamp_only_index(monkeypatch):
+    mongo_db = mongomock.MongoClient().db
+    router = ShardRouter(parse_shards("3"))
+    monkeypatch.setattr(migrate_module, "message_shards", router)
+    mongo_db.messages.create_index(LEGACY_CONVERSATION_INDEX)
+    
+    conversation_order_indexes(None, mongo_db)
+    conversation_order_indexes(None, mongo_db)
+    for collection in router.all_collections(mongo_db):
+        keys = [[tuple(key) for key in info['key']] for info in collection.index_information().values()]
+        assert CONVERSATION_INDEX in keys
+        assert LEGACY_CONVERSATION_INDEX not in keys
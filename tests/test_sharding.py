@@ -0,0 +1,55 @@
+from datetime import datetime
+from bson import ObjectId
+from app.database import get_mongo_db
+from app.sharding import HashRing, ShardRouter, parse_shards, rebalance
+
+def test_parse_shards():
+    assert parse_shards("1") == ["messages"]
+    assert parse_shards("3") == ["messages", "messages_1", "messages_2"]
+    assert parse_shards("messages, archive_db.messages") == ["messages", "archive_db.messages"]
+    assert parse_shards("") == []
+
+def test_ring_is_symmetric_and_moves_few_conversations():
+    four = HashRing(parse_shards("4"))
+    five = HashRing(parse_shards("5"))
+    pairs = [(user_id, user_id + 7919) for user_id in range(5000)]
+    
+    assert all(four.shard_for(a, b) == four.shard_for(b, a) for a, b in pairs)
+    moved = sum(four.shard_for(a, b) != five.shard_for(a, b) for a, b in pairs)
+    assert moved < len(pairs) * 0.35
+    assert all(five.shard_for(a, b) == "messages_4" for a, b in pairs if four.shard_for(a, b) != five.shard_for(a, b))
+
+def test_reads_cover_previous_shard_while_rebalancing():
+    router = ShardRouter(parse_shards("4"), previous=parse_shards("1"))
+    assert router.shard_names[0] == "messages"
+    for user_id in range(50):
+        names = [collection.name for collection in router.collections_for(get_mongo_db(), user_id, 1000)]
+        assert names[0] == router.ring.shard_for(user_id, 1000)
+        assert "messages" in names
+
+def test_rebalance_moves_messages_to_owning_shard():
+    mongo_db = get_mongo_db()
+    router = ShardRouter(parse_shards("3"), previous=parse_shards("1"))
+    for collection in router.all_collections(mongo_db):
+        collection.delete_many({'content': 'Sharded'})
+    mongo_db.messages.insert_many([{
+        '_id': ObjectId(),
+        'sender_id': user_id,
+        'receiver_id': 5000,
+        'content': 'Sharded',
+        'timestamp': datetime(2024, 1, 1, 12, 0, 0),
+        'read': False,
+        'read_at': None
+    } for user_id in range(30)])
+    
+    try:
+        rebalance(mongo_db, router)
+        for user_id in range(30):
+            owner = router.collection_for(mongo_db, user_id, 5000)
+            assert owner.count_documents({'sender_id': user_id, 'content': 'Sharded'}) == 1
+            merged = list(router.find(mongo_db, user_id, 5000, {'sender_id': user_id, 'content': 'Sharded'}))
+            assert len(merged) == 1
+        assert rebalance(mongo_db, router) == {}
+    finally:
+        for collection in router.all_collections(mongo_db):
+            collection.delete_many({'content': 'Sharded'})
@@ -0,0 +1,76 @@
+import asyncio
+import mongomock
+import pytest
+from app import socket_handlers
+from app.spool import Spool
+from app.simulation import SimulationProfile, parse_profile, ALL_FEATURES
+
+def test_default_profile_is_disabled():
+    profile = parse_profile(None)
+    assert not profile.enabled
+    assert not profile.temporal_wobble
+    assert not profile.artistic_chronology
+    assert not profile.phantom_typing
+    assert not profile.harmonic_sync
+
+def test_disabled_profile_never_touches_rng(tmp_path, monkeypatch):
+    profile = parse_profile("off", seed=7)
+    state = profile.rng.getstate()
+    mongo_db = mongomock.MongoClient().db
+    sleeps = []
+    tasks = []
+    emitted = []
+
+    async def fake_user(token):
+        return type("User", (), {"id": 1})()
+
+    async def fake_sleep(delay, *args, **kwargs):
+        sleeps.append(delay)
+
+    async def fake_emit(event, data, room=None, **kwargs):
+        emitted.append(event)
+
+    monkeypatch.setattr(socket_handlers, "simulation", profile)
+    monkeypatch.setattr(socket_handlers, "background_tasks_started", False)
+    monkeypatch.setattr(socket_handlers, "spool", Spool(str(tmp_path)))
+    monkeypatch.setattr(socket_handlers, "get_mongo_db", lambda: mongo_db)
+    monkeypatch.setattr(socket_handlers, "get_user_from_token", fake_user)
+    monkeypatch.setattr(socket_handlers, "connected_users", {1: "sid-sender"})
+    monkeypatch.setattr(socket_handlers.sio, "emit", fake_emit)
+    monkeypatch.setattr(socket_handlers.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(socket_handlers.asyncio, "create_task", lambda coro: tasks.append(coro))
+
+    async def scenario():
+        await socket_handlers.start_background_tasks()
+        for i in range(20):
+            await socket_handlers.send_message("sid-sender", {
+                'token': 'token', 'receiver_id': 2, 'content': f'Message {i}'
+            })
+
+    asyncio.run(scenario())
+    assert not profile.enabled
+    assert emitted == ['message_sent'] * 20
+    assert mongo_db.messages.count_documents({}) == 20
+    assert sleeps == []
+    assert tasks == []
+    assert profile.rng.getstate() == state
+
+def test_named_profiles_and_features_combine():
+    profile = parse_profile("delivery, harmonic_sync")
+    assert profile.temporal_wobble
+    assert profile.artistic_chronology
+    assert profile.harmonic_sync
+    assert not profile.phantom_typing
+    assert parse_profile("full").features == frozenset(ALL_FEATURES)
+
+def test_unknown_feature_is_rejected():
+    with pytest.raises(ValueError):
+        parse_profile("wobbly")
+
+def test_seeded_profiles_are_reproducible():
+    first = SimulationProfile(ALL_FEATURES, seed=42)
+    second = SimulationProfile(ALL_FEATURES, seed=42)
+    first_run = [first.calculate_temporal_wobble() for _ in range(50)]
+    second_run = [second.calculate_temporal_wobble() for _ in range(50)]
+    assert first_run == second_run
+    assert all(0 <= delay <= 0.9 for delay in first_run)
@@ -0,0 +1,229 @@
+import asyncio
+import os
+import threading
+import mongomock
+import pytest
+from datetime import datetime
+from bson import ObjectId
+from app import socket_handlers, spool as spool_module
+from app.spool import Spool, SpoolLocked
+from app.database import get_mongo_db
+
+def make_message(i):
+    return {
+        '_id': ObjectId(),
+        'sender_id': 1,
+        'receiver_id': 2,
+        'content': f'Spooled {i}',
+        'timestamp': datetime(2024, 1, 1, 12, 0, i),
+        'read': False,
+        'read_at': None
+    }
+
+def write_messages(spool, messages):
+    async def scenario():
+        spool.open()
+        for message in messages:
+            await spool.append(message)
+        spool.close()
+    asyncio.run(scenario())
+
+def test_journal_survives_restart(tmp_path):
+    messages = [make_message(i) for i in range(3)]
+    write_messages(Spool(str(tmp_path)), messages)
+    
+    reopened = Spool(str(tmp_path))
+    assert reopened.open() == 3
+    assert [message for _, message in reopened.pending] == messages
+    reopened.close()
+
+def test_torn_tail_is_discarded(tmp_path):
+    messages = [make_message(i) for i in range(2)]
+    write_messages(Spool(str(tmp_path)), messages)
+    with open(tmp_path / "journal.log", "ab") as journal:
+        journal.write(b"\x40\x00\x00\x00partial")
+    
+    reopened = Spool(str(tmp_path))
+    assert reopened.open() == 2
+    assert (tmp_path / "journal.log").stat().st_size == reopened.write_offset
+    reopened.close()
+
+def test_second_writer_cannot_open_a_locked_journal(tmp_path):
+    messages = [make_message(i) for i in range(2)]
+    first = Spool(str(tmp_path))
+    
+    async def scenario():
+        first.open()
+        for message in messages:
+            await first.append(message)
+        with pytest.raises(SpoolLocked):
+            Spool(str(tmp_path)).open()
+        first.close()
+    
+    asyncio.run(scenario())
+    reopened = Spool(str(tmp_path))
+    assert reopened.open() == 2
+    reopened.close()
+
+def test_start_spool_falls_back_to_direct_inserts_when_locked(tmp_path, monkeypatch):
+    holder = Spool(str(tmp_path))
+    monkeypatch.setattr(spool_module, "spool", Spool(str(tmp_path)))
+    monkeypatch.setattr(spool_module, "SPOOL_ENABLED", True)
+    
+    async def scenario():
+        holder.open()
+        await spool_module.start_spool()
+        holder.close()
+    
+    asyncio.run(scenario())
+    assert not spool_module.spool.is_open
+
+def test_unknown_fsync_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        Spool(str(tmp_path), "sometimes")
+
+def test_drain_replays_journal_into_mongo(tmp_path):
+    mongo_db = get_mongo_db()
+    messages = [make_message(i) for i in range(3)]
+    write_messages(Spool(str(tmp_path)), messages)
+    mongo_db.messages.insert_one(dict(messages[0]))
+    
+    async def scenario():
+        spool = Spool(str(tmp_path))
+        spool.open()
+        drained = await spool.drain_once(mongo_db)
+        spool.close()
+        return drained
+    
+    try:
+        assert asyncio.run(scenario()) == 3
+        assert mongo_db.messages.count_documents({'content': {'$regex': '^Spooled'}}) == 3
+        assert Spool(str(tmp_path)).open() == 0
+    finally:
+        mongo_db.messages.delete_many({'content': {'$regex': '^Spooled'}})
+
+def test_mark_read_before_drain_is_persisted(tmp_path, monkeypatch):
+    mongo_db = mongomock.MongoClient().db
+    spool = Spool(str(tmp_path))
+    message = make_message(0)
+    emitted = []
+
+    async def fake_user(token):
+        return type("User", (), {"id": 2})()
+
+    async def fake_emit(event, data, room=None, **kwargs):
+        emitted.append((event, room))
+
+    monkeypatch.setattr(socket_handlers, "spool", spool)
+    monkeypatch.setattr(socket_handlers, "get_mongo_db", lambda: mongo_db)
+    monkeypatch.setattr(socket_handlers, "get_user_from_token", fake_user)
+    monkeypatch.setattr(socket_handlers.sio, "emit", fake_emit)
+    monkeypatch.setattr(socket_handlers, "connected_users", {1: "sid-sender", 2: "sid-reader"})
+
+    async def scenario():
+        spool.open()
+        await spool.append(message)
+        await socket_handlers.mark_read("sid-reader", {
+            'token': 'token', 'message_id': str(message['_id']), 'sender_id': 1
+        })
+        await spool.drain_once(mongo_db)
+        spool.close()
+
+    asyncio.run(scenario())
+    stored = mongo_db.messages.find_one({'_id': message['_id']})
+    assert stored['read'] is True
+    assert stored['read_at'] is not None
+    assert emitted == [('message_read', 'sid-sender')]
+
+def test_receipt_during_inflight_insert_is_reapplied(tmp_path, monkeypatch):
+    mongo_db = mongomock.MongoClient().db
+    spool = Spool(str(tmp_path))
+    message = make_message(0)
+    insert = spool_module.insert_idempotent
+
+    def insert_then_mark_read(db, messages):
+        insert(db, [dict(m) for m in messages])
+        spool.mark_read(message['_id'], 2)
+
+    monkeypatch.setattr(spool_module, "insert_idempotent", insert_then_mark_read)
+
+    async def scenario():
+        spool.open()
+        await spool.append(message)
+        await spool.drain_once(mongo_db)
+        spool.close()
+
+    asyncio.run(scenario())
+    assert mongo_db.messages.find_one({'_id': message['_id']})['read'] is True
+    assert spool.mark_read(message['_id'], 2) is None
+
+def test_fsync_from_before_rotation_does_not_cover_new_frames(tmp_path, monkeypatch):
+    mongo_db = mongomock.MongoClient().db
+    spool = Spool(str(tmp_path))
+    monkeypatch.setattr(spool_module, "SPOOL_ROTATE_BYTES", 1)
+    release = threading.Event()
+    fsynced = []
+    real_fsync = os.fsync
+    
+    def slow_fsync(fd):
+        if fd == spool.fd:
+            fsynced.append(fd)
+            release.wait(5)
+        real_fsync(fd)
+    
+    async def scenario():
+        spool.open()
+        await spool.append(make_message(0))
+        monkeypatch.setattr(os, "fsync", slow_fsync)
+        spool.sync_task = asyncio.ensure_future(spool._fsync())
+        await asyncio.sleep(0.05)
+        await spool.drain_once(mongo_db)
+        assert spool.write_offset == 0
+        release.set()
+        await spool.sync_task
+        assert spool.synced_offset == 0
+        
+        fsynced.clear()
+        await spool.append(make_message(1))
+        assert fsynced
+        assert spool.synced_offset == spool.write_offset
+        spool.close()
+    
+    asyncio.run(scenario())
+
+def test_short_writes_are_completed(tmp_path, monkeypatch):
+    spool = Spool(str(tmp_path), "off")
+    real_write = os.write
+    monkeypatch.setattr(os, "write", lambda fd, data: real_write(fd, bytes(data)[:7]))
+    messages = [make_message(i) for i in range(2)]
+    write_messages(spool, messages)
+    monkeypatch.setattr(os, "write", real_write)
+    
+    reopened = Spool(str(tmp_path))
+    assert reopened.open() == 2
+    assert [message for _, message in reopened.pending] == messages
+    reopened.close()
+
+def test_failed_write_leaves_no_torn_frame(tmp_path, monkeypatch):
+    spool = Spool(str(tmp_path), "off")
+    real_write = os.write
+    
+    def failing_write(fd, data):
+        real_write(fd, bytes(data)[:7])
+        raise OSError(28, "No space left on device")
+    
+    async def scenario():
+        spool.open()
+        await spool.append(make_message(0))
+        monkeypatch.setattr(os, "write", failing_write)
+        with pytest.raises(OSError):
+            await spool.append(make_message(1))
+        monkeypatch.setattr(os, "write", real_write)
+        await spool.append(make_message(2))
+        spool.close()
+    
+    asyncio.run(scenario())
+    reopened = Spool(str(tmp_path))
+    assert reopened.open() == 2
+    assert [message['content'] for _, message in reopened.pending] == ['Spooled 0', 'Spooled 2']
+    reopened.close()
@@ -0,0 +1,47 @@
+import gzip
+from app.static_assets import StaticAssets, negotiate
+
+PAGE = b"<html><body>" + b"<p>Hello, chat!</p>" * 200 + b"</body></html>"
+
+def make_assets(tmp_path):
+    (tmp_path / "index.html").write_bytes(PAGE)
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG" + bytes(200))
+    assets = StaticAssets(str(tmp_path), max_age=600)
+    assets.load()
+    return assets
+
+def test_variants_are_built_once(tmp_path):
+    assets = make_assets(tmp_path)
+    page = assets.get("index.html")
+    
+    assert page.media_type == "text/html; charset=utf-8"
+    assert gzip.decompress(page.variants["gzip"]) == PAGE
+    assert set(assets.get("logo.png").variants) == {"identity"}
+    assert assets.get("missing.js") is None
+
+def test_negotiation_prefers_smallest_accepted_encoding():
+    variants = {"identity": b"x" * 100, "gzip": b"x" * 40, "br": b"x" * 30}
+    assert negotiate(None, variants) == "identity"
+    assert negotiate("gzip, deflate", variants) == "gzip"
+    assert negotiate("gzip, br", variants) == "br"
+    assert negotiate("br;q=0, gzip", variants) == "gzip"
+    assert negotiate("*", {"identity": b""}) == "identity"
+    assert negotiate("gzip, br", {"identity": b"x" * 100, "gzip": b"x" * 30, "br": b"x" * 40}) == "gzip"
+
+def test_conditional_request_returns_not_modified(tmp_path):
+    assets = make_assets(tmp_path)
+    page = assets.get("index.html")
+    
+    first = assets.response(page, {"accept-encoding": "gzip"}, "no-cache")
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["vary"] == "Accept-Encoding"
+    assert first.body == page.variants["gzip"]
+    
+    etag = first.headers["etag"]
+    repeat = assets.response(page, {"accept-encoding": "gzip", "if-none-match": etag}, "no-cache")
+    assert repeat.status_code == 304
+    assert repeat.body == b""
+    
+    identity = assets.response(page, {"if-none-match": etag}, "no-cache")
+    assert identity.status_code == 200
+    assert identity.headers["etag"] != etag
@@ -52,3 +52,76 @@ def test_list_users(auth_token):
     data = response.json()
     assert len(data) >= 1
 
+
+def test_list_users_conditional_get(auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    first = client.get("/api/users/", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    
+    unchanged = client.get("/api/users/", headers={**headers, "If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    
+    client.post("/api/auth/register", json={"mobile_number": "5555555555"})
+    changed = client.get("/api/users/", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+def test_get_users_batch(auth_token):
+    db = SessionLocal()
+    others = [User(mobile_number=f"555000000{i}", username=f"Batch{i}") for i in range(3)]
+    db.add_all(others)
+    db.commit()
+    ids = [user.id for user in others]
+    db.close()
+    
+    response = client.get(
+        "/api/users/batch",
+        params={"ids": ids + [ids[0], 999999]},
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == 200
+    assert [user["id"] for user in response.json()] == sorted(ids)
+
+def test_list_users_keyset_pagination(auth_token):
+    db = SessionLocal()
+    db.add_all([User(mobile_number=f"555000001{i}") for i in range(5)])
+    db.commit()
+    db.close()
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    
+    first_page = client.get("/api/users/", params={"limit": 2}, headers=headers).json()
+    second_page = client.get(
+        "/api/users/",
+        params={"limit": 2, "after_id": first_page[-1]["id"]},
+        headers=headers
+    ).json()
+    ids = [user["id"] for user in first_page + second_page]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == 4
+
+def test_list_users_rejects_skip_with_after_id(auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = client.get("/api/users/", params={"skip": 5, "after_id": 1}, headers=headers)
+    assert response.status_code == 400
+    
+    response = client.get("/api/users/", params={"skip": 0, "after_id": 1}, headers=headers)
+    assert response.status_code == 200
+
+def test_search_users_by_prefix(auth_token):
+    db = SessionLocal()
+    db.add_all([
+        User(mobile_number="5550000020", username="Alice"),
+        User(mobile_number="5550000021", username="alfred"),
+        User(mobile_number="7770000022", username="Bob"),
+    ])
+    db.commit()
+    db.close()
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    
+    by_name = client.get("/api/users/search", params={"q": "AL"}, headers=headers).json()
+    assert sorted(user["username"] for user in by_name) == ["Alice", "alfred"]
+    
+    by_mobile = client.get("/api/users/search", params={"q": "777-000"}, headers=headers).json()
+    assert [user["username"] for user in by_mobile] == ["Bob"]